@@ -0,0 +1,306 @@
+"""
+Retention for signal streams: a hot window in Redis, older entries on disk.
+
+The Archiver periodically moves entries older than RETENTION_HOT_HOURS out of
+each stream into day-partitioned files under ARCHIVE_DIR, then trims the
+stream with XTRIM MINID up to the last archived ID, so Redis memory stays
+bounded while history remains queryable:
+
+    <ARCHIVE_DIR>/<stream>/<YYYY-MM-DD>/data.bin    compressed column blocks
+    <ARCHIVE_DIR>/<stream>/<YYYY-MM-DD>/index.ndjson  one [first, last, offset, length, rows] line per block
+
+Each block holds up to ARCHIVE_BLOCK_ROWS entries stored column-wise (IDs,
+then one array per field) and zlib-compressed. Readers memory-map data.bin
+and use the index to decompress only the blocks overlapping a range; history
+reads go through the archive first and continue on the live stream after the
+last archived ID, so entries that are both archived and not yet trimmed are
+returned once. Both files are only ever appended to, so a block costs the
+same however full its day already is.
+
+Retention is off unless ARCHIVE_DIR is set. One instance at a time archives,
+under a Redis lock renewed before every block; a run that loses the lock stops
+before writing again. Every instance serving history needs ARCHIVE_DIR on a
+shared volume.
+"""
+import asyncio
+import logging
+import mmap
+import os
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+from background import BackgroundService
+from hub import parse_stream_id
+from redis_pool import release_lease, renew_lease
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")
+HOT_WINDOW_HOURS = float(os.getenv("RETENTION_HOT_HOURS", "24"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "300"))
+BLOCK_ROWS = int(os.getenv("ARCHIVE_BLOCK_ROWS", "4096"))
+LOCK_KEY = "retention:lock"
+
+Entry = Tuple[str, Dict[str, str]]
+StreamId = Tuple[int, int]
+
+_MAX_SEQ = 2 ** 64 - 1
+
+
+def parse_range_bound(value: str, upper: bool) -> Tuple[StreamId, bool]:
+    """An XRANGE-style bound ("-", "+", "<id>", "<ms>", "(<id>") as (ID, exclusive)."""
+    exclusive = value.startswith("(")
+    raw = value[1:] if exclusive else value
+    if raw == "-":
+        return (0, 0), False
+    if raw == "+":
+        return (_MAX_SEQ, _MAX_SEQ), False
+    parsed = parse_stream_id(raw)
+    if parsed is None:
+        raise ValueError(f"Invalid range bound {value!r}")
+    if "-" not in raw and upper:
+        # A bare millisecond end bound covers every sequence number in it, as in XRANGE
+        parsed = (parsed[0], _MAX_SEQ)
+    return parsed, exclusive
+
+
+def _day(ms: int, default: str = "9999-12-31") -> str:
+    try:
+        return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+    except (OverflowError, OSError, ValueError):
+        return default
+
+
+def encode_block(entries: List[Entry]) -> bytes:
+    """Column-wise, compressed encoding of a run of entries (oldest first)."""
+    names = sorted({name for _, fields in entries for name in fields})
+    columns = {name: [fields.get(name) for _, fields in entries] for name in names}
+    return zlib.compress(orjson.dumps({"ids": [entry_id for entry_id, _ in entries], "cols": columns}), 6)
+
+
+def decode_block(data: bytes) -> List[Entry]:
+    block = orjson.loads(zlib.decompress(data))
+    columns = block["cols"].items()
+    return [
+        (entry_id, {name: values[i] for name, values in columns if values[i] is not None})
+        for i, entry_id in enumerate(block["ids"])
+    ]
+
+
+class Partition:
+    """One stream-day on disk: an append-only block file and its index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data_path = os.path.join(path, "data.bin")
+        self.index_path = os.path.join(path, "index.ndjson")
+        self._index: List[List[Any]] = []
+        # Inode of the index file and how many of its bytes have been parsed into _index
+        self._index_inode: Optional[int] = None
+        self._index_read = 0
+
+    @property
+    def index(self) -> List[List[Any]]:
+        """[first ID, last ID, offset, length, rows] per block; only lines added since the last call are read."""
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            return []
+        if st.st_ino != self._index_inode or st.st_size < self._index_read:
+            self._index, self._index_inode, self._index_read = [], st.st_ino, 0
+        if st.st_size > self._index_read:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_read)
+                tail = f.read()
+            # A line still being written is picked up once its newline lands
+            complete = tail[:tail.rfind(b"\n") + 1]
+            for line in complete.splitlines():
+                try:
+                    self._index.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    logger.warning(f"Skipping torn line in {self.index_path}")
+            self._index_read += len(complete)
+        return self._index
+
+    def append(self, entries: List[Entry]) -> None:
+        """Write one block and publish it in the index; a crash before the index is written only leaves unused bytes."""
+        os.makedirs(self.path, exist_ok=True)
+        data = encode_block(entries)
+        with open(self.data_path, "ab") as f:
+            offset = f.tell()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        line = orjson.dumps([entries[0][0], entries[-1][0], offset, len(data), len(entries)]) + b"\n"
+        with open(self.index_path, "a+b") as f:
+            # Close off a line torn by a crash so this one parses on its own
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self, low: StreamId, high: StreamId) -> Iterator[List[Entry]]:
+        """Entries of each block overlapping [low, high], via a read-only memory map."""
+        blocks = [
+            block for block in self.index
+            if parse_stream_id(block[1]) >= low and parse_stream_id(block[0]) <= high
+        ]
+        if not blocks:
+            return
+        with open(self.data_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for _, _, offset, length, _ in blocks:
+                entries = decode_block(data[offset:offset + length])
+                yield [entry for entry in entries if low <= parse_stream_id(entry[0]) <= high]
+
+
+class ArchiveStore:
+    """Day partitions of every archived stream under one directory."""
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+        self._partitions: Dict[Tuple[str, str], Partition] = {}
+
+    def _stream_dir(self, stream_key: str) -> str:
+        return os.path.join(self.root, stream_key.replace(":", "_").replace("/", "_"))
+
+    def partition(self, stream_key: str, day: str) -> Partition:
+        key = (stream_key, day)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = self._partitions[key] = Partition(os.path.join(self._stream_dir(stream_key), day))
+        return partition
+
+    def days(self, stream_key: str) -> List[str]:
+        try:
+            return sorted(os.listdir(self._stream_dir(stream_key)))
+        except FileNotFoundError:
+            return []
+
+    def last_id(self, stream_key: str) -> Optional[str]:
+        """Newest archived ID of a stream, or None if nothing is archived."""
+        for day in reversed(self.days(stream_key)):
+            index = self.partition(stream_key, day).index
+            if index:
+                return index[-1][1]
+        return None
+
+    def append(self, stream_key: str, entries: List[Entry]) -> None:
+        """Archive entries (oldest first, newer than anything archived), split by UTC day."""
+        run: List[Entry] = []
+        run_day = None
+        for entry in entries:
+            day = _day(int(entry[0].split("-", 1)[0]))
+            if run and (day != run_day or len(run) >= BLOCK_ROWS):
+                self.partition(stream_key, run_day).append(run)
+                run = []
+            run_day = day
+            run.append(entry)
+        if run:
+            self.partition(stream_key, run_day).append(run)
+
+    def read_range(self, stream_key: str, start: str, end: str) -> Iterator[List[Entry]]:
+        """Archived entries in an XRANGE-style [start, end], oldest first, one block at a time."""
+        (low, low_exclusive), (high, high_exclusive) = parse_range_bound(start, False), parse_range_bound(end, True)
+        first_day = _day(low[0]) if low[0] else ""
+        last_day = _day(high[0])
+        for day in self.days(stream_key):
+            if not first_day <= day <= last_day:
+                continue
+            for entries in self.partition(stream_key, day).read(low, high):
+                if low_exclusive or high_exclusive:
+                    entries = [
+                        entry for entry in entries
+                        if not (low_exclusive and parse_stream_id(entry[0]) == low)
+                        and not (high_exclusive and parse_stream_id(entry[0]) == high)
+                    ]
+                if entries:
+                    yield entries
+
+
+class LeaseLostError(Exception):
+    """Raised when the retention lock passed to another instance during a run."""
+
+
+class Archiver(BackgroundService):
+    """Moves entries older than the hot window from Redis to the ArchiveStore, then trims."""
+
+    task_name = "retention:archiver"
+
+    def __init__(
+        self,
+        get_client: Callable[[], Awaitable],
+        store: ArchiveStore,
+        streams: Iterable[str],
+        hot_window_hours: float = HOT_WINDOW_HOURS,
+        interval: float = ARCHIVE_INTERVAL,
+    ):
+        self._get_client = get_client
+        self.store = store
+        self.streams = list(streams)
+        self._hot_ms = int(hot_window_hours * 3600 * 1000)
+        self._interval = interval
+        # Renewed before every block, so only a single block has to fit in it
+        self._lock_ms = int(max(interval, 60) * 1000)
+        self._token = uuid.uuid4().hex
+        self.archived = 0
+
+    async def archive_stream(self, client, stream_key: str) -> int:
+        """Archive one stream up to the hot-window cutoff; returns the number of entries moved."""
+        cutoff = f"({int(time.time() * 1000) - self._hot_ms}-0"
+        last = self.store.last_id(stream_key)
+        start = f"({last}" if last else "-"
+        moved = 0
+        while True:
+            entries = await client.xrange(stream_key, min=start, max=cutoff, count=BLOCK_ROWS)
+            if not entries:
+                break
+            # Another instance must never append to the same partitions concurrently
+            if not await renew_lease(client, LOCK_KEY, self._token, self._lock_ms):
+                raise LeaseLostError(f"Lost {LOCK_KEY} while archiving {stream_key}")
+            # Disk writes and compression stay off the event loop
+            await asyncio.to_thread(self.store.append, stream_key, entries)
+            moved += len(entries)
+            last = entries[-1][0]
+            start = f"({last}"
+            if len(entries) < BLOCK_ROWS:
+                break
+        if last:
+            # Only what is safely on disk leaves Redis; MINID drops IDs below the bound
+            ms, seq = parse_stream_id(last)
+            await client.xtrim(stream_key, minid=f"{ms}-{seq + 1}", approximate=True)
+        return moved
+
+    async def run_once(self) -> None:
+        client = await self._get_client()
+        # One archiver at a time across instances
+        if not await client.set(LOCK_KEY, self._token, nx=True, px=self._lock_ms):
+            return
+        try:
+            for stream_key in self.streams:
+                moved = await self.archive_stream(client, stream_key)
+                if moved:
+                    self.archived += moved
+                    logger.info(f"Archived {moved} entries from {stream_key}")
+        except LeaseLostError as e:
+            # Blocks written so far are indexed; they are trimmed by the next run
+            logger.warning(f"{e}; stopping this run")
+        finally:
+            await release_lease(client, LOCK_KEY, self._token)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error archiving {self.streams}: {e}")
+            await asyncio.sleep(self._interval)
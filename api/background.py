@@ -0,0 +1,35 @@
+"""
+Shared lifecycle for objects that run one long-lived asyncio task.
+
+Subclasses implement `_run` (and may set `task_name`); start() is idempotent
+and stop() cancels the task and waits for it to finish.
+"""
+import asyncio
+from typing import Optional
+
+
+class BackgroundService:
+    """Owns at most one running `_run` task."""
+
+    task_name = "background"
+    _task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name=self.task_name)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        raise NotImplementedError
@@ -2,12 +2,17 @@
 import os
 import asyncio
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 import discord
 from discord.ext import commands
-import redis.asyncio as redis
 import orjson
-import stripe
+
+from broadcaster import SignalBroadcaster, signal_field
+from redis_pool import get_blocking_client, get_read_client, get_redis_client
+from shards import SHARDED, ShardCoordinator, ShardedBot
+from signals import decode_signal
+from singleflight import SingleFlight, VersionedCache
+from stripe_gateway import GatewayBusyError, StripeGateway
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,41 +21,28 @@ logger = logging.getLogger(__name__)
 # Bot configuration
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+if SHARDED:
+    bot = ShardedBot(command_prefix='!', intents=intents)
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents)
 
-# Redis connection
-redis_client: Optional[redis.Redis] = None
+# Posts new signals to BOT_SIGNAL_CHANNELS as they arrive
+broadcaster = SignalBroadcaster(bot, get_blocking_client, os.getenv("REDIS_STREAM_KEY", "signals:live"))
 
-# Stripe configuration
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+# When sharded, Redis decides this process's shards and whether it runs the broadcaster
+coordinator: Optional[ShardCoordinator] = None
+if SHARDED:
+    coordinator = ShardCoordinator(bot, get_redis_client, on_elected=broadcaster.start, on_deposed=broadcaster.stop)
+    bot.coordinator = coordinator
 
-async def get_redis_client():
-    global redis_client
-    if redis_client is None:
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        ssl = os.getenv("REDIS_SSL", "false").lower() == "true"
-        ca_cert_use_certifi = os.getenv("REDIS_CA_CERT_USE_CERTIFI", "false").lower() == "true"
-        
-        connection_kwargs = {
-            "decode_responses": True,
-        }
-        
-        if ssl:
-            from urllib.parse import urlparse
-            import certifi
-            parsed = urlparse(redis_url)
-            redis_client = redis.Redis(
-                host=parsed.hostname,
-                port=parsed.port,
-                password=parsed.password,
-                decode_responses=True,
-                ssl=True,
-                ssl_ca_certs=certifi.where() if ca_cert_use_certifi else None
-            )
-        else:
-            redis_client = redis.from_url(redis_url, **connection_kwargs)
-    
-    return redis_client
+# Identical concurrent commands share one Redis fetch; results are reused until
+# a new signal arrives (the broadcaster's newest ID) or the TTL runs out
+COMMAND_CACHE_TTL = float(os.getenv("BOT_COMMAND_CACHE_TTL", "5"))
+command_flight = SingleFlight()
+command_cache = VersionedCache(COMMAND_CACHE_TTL)
+
+# Stripe calls run in a bounded worker pool, off the event loop
+stripe_gateway = StripeGateway()
 
 @bot.event
 async def on_ready():
@@ -63,6 +55,11 @@ async def on_ready():
         logger.info("Redis connection established")
     except Exception as e:
         logger.error(f"Failed to connect to Redis: {e}")
+    
+    # on_ready fires again after reconnects; start() is a no-op while running.
+    # Sharded, only the leader process broadcasts (see ShardCoordinator)
+    if coordinator is None:
+        broadcaster.start()
 
 @bot.event
 async def on_command_error(ctx, error):
@@ -77,45 +74,40 @@ async def ping(ctx):
     latency = round(bot.latency * 1000)
     await ctx.send(f"🏓 Pong! Latency: {latency}ms")
 
+async def build_signals_embed(limit: int) -> Optional[discord.Embed]:
+    """Embed of the latest signals, or None when the stream is empty"""
+    client = await get_read_client()
+    stream_key = os.getenv("REDIS_STREAM_KEY", "signals:live")
+    
+    # Get latest signals
+    messages = await client.xrevrange(stream_key, count=limit)
+    
+    if not messages:
+        return None
+    
+    embed = discord.Embed(
+        title="📊 Latest Trading Signals",
+        color=0x00ff00
+    )
+    
+    for entry_id, fields in messages:
+        name, value = signal_field(decode_signal(entry_id, fields))
+        embed.add_field(name=name, value=value, inline=False)
+    
+    return embed
+
 @bot.command(name="signals")
 async def signals(ctx, limit: int = 5):
     """Get latest trading signals from Redis stream"""
     try:
-        client = await get_redis_client()
-        stream_key = os.getenv("REDIS_STREAM_KEY", "signals:live")
-        
-        # Get latest signals
-        messages = await client.xrevrange(stream_key, count=limit)
+        embed = await command_cache.get_or_fetch(
+            ("signals", limit), broadcaster.newest_id, lambda: build_signals_embed(limit), command_flight
+        )
         
-        if not messages:
+        if embed is None:
             await ctx.send("No signals available at the moment.")
             return
         
-        embed = discord.Embed(
-            title="📊 Latest Trading Signals",
-            color=0x00ff00
-        )
-        
-        for entry_id, fields in messages:
-            symbol = fields.get("symbol", "N/A")
-            side = fields.get("side", "N/A")
-            price = fields.get("price", "N/A")
-            timestamp = entry_id.split("-")[0]
-            
-            # Format timestamp
-            import datetime
-            dt = datetime.datetime.fromtimestamp(int(timestamp) / 1000)
-            formatted_time = dt.strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Color based on side
-            color = 0x00ff00 if side.upper() == "BUY" else 0xff0000
-            
-            embed.add_field(
-                name=f"{symbol} - {side}",
-                value=f"Price: ${price}\nTime: {formatted_time}",
-                inline=False
-            )
-        
         await ctx.send(embed=embed)
         
     except Exception as e:
@@ -154,20 +146,13 @@ async def subscribe(ctx, plan: str = "basic"):
         
         selected_plan = plans[plan]
         
-        # Create Stripe checkout session
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price': selected_plan['price_id'],
-                'quantity': 1,
-            }],
-            mode='subscription',
+        # Create (or reuse) a Stripe checkout session
+        checkout_url = await stripe_gateway.checkout_url(
+            user_id=str(ctx.author.id),
+            username=str(ctx.author),
+            price_id=selected_plan['price_id'],
             success_url=f"{os.getenv('NEXTAUTH_URL', 'http://localhost:3000')}/dashboard?success=true",
             cancel_url=f"{os.getenv('NEXTAUTH_URL', 'http://localhost:3000')}/dashboard?canceled=true",
-            metadata={
-                'discord_user_id': str(ctx.author.id),
-                'discord_username': str(ctx.author)
-            }
         )
         
         embed = discord.Embed(
@@ -177,43 +162,74 @@ async def subscribe(ctx, plan: str = "basic"):
         )
         embed.add_field(
             name="Next Steps",
-            value=f"Click [here]({checkout_session.url}) to complete your subscription",
+            value=f"Click [here]({checkout_url}) to complete your subscription",
             inline=False
         )
         
         await ctx.send(embed=embed)
         
+    except GatewayBusyError:
+        await ctx.send("Checkout is busy right now. Please try again in a moment.")
+    except asyncio.TimeoutError:
+        # The session may still be created; a retry reuses it rather than making another
+        await ctx.send("Stripe is slow to respond. Please run the command again in a moment.")
     except Exception as e:
         logger.error(f"Error creating subscription: {e}")
         await ctx.send("Error creating subscription. Please try again later.")
 
+async def fetch_redis_status() -> Tuple[str, int]:
+    """Redis reachability and stream length for !status"""
+    client = await get_redis_client()
+    
+    # Test Redis connection
+    redis_status = "✅ Connected"
+    try:
+        await client.ping()
+    except Exception:
+        redis_status = "❌ Disconnected"
+    
+    # Get Redis stream info
+    stream_key = os.getenv("REDIS_STREAM_KEY", "signals:live")
+    stream_length = await (await get_read_client()).xlen(stream_key)
+    return redis_status, stream_length
+
 @bot.command(name="status")
 async def status(ctx):
     """Check bot and system status"""
     try:
-        client = await get_redis_client()
-        
-        # Test Redis connection
-        redis_status = "✅ Connected"
-        try:
-            await client.ping()
-        except Exception:
-            redis_status = "❌ Disconnected"
-        
-        # Get Redis stream info
-        stream_key = os.getenv("REDIS_STREAM_KEY", "signals:live")
-        stream_length = await client.xlen(stream_key)
+        redis_status, stream_length = await command_cache.get_or_fetch(
+            ("status",), broadcaster.newest_id, fetch_redis_status, command_flight
+        )
         
         embed = discord.Embed(
             title="🤖 Bot Status",
             color=0x00ff00
         )
         embed.add_field(name="Bot Status", value="✅ Online", inline=True)
-        embed.add_field(name="Latency", value=f"{round(bot.latency * 1000)}ms", inline=True)
+        if coordinator is None:
+            embed.add_field(name="Latency", value=f"{round(bot.latency * 1000)}ms", inline=True)
+        else:
+            # Totals over every process's shards, not just the one answering
+            cluster = await command_cache.get_or_fetch(
+                ("cluster",), None, coordinator.cluster_stats, command_flight
+            )
+            latency = "n/a" if cluster["latency_avg_ms"] is None else (
+                f"{cluster['latency_avg_ms']}ms avg, {cluster['latency_max_ms']}ms max"
+            )
+            embed.add_field(name="Latency", value=latency, inline=True)
+            embed.add_field(
+                name="Shards",
+                value=f"{cluster['shards_online']}/{cluster['shard_count']} online in {cluster['processes']} processes",
+                inline=True
+            )
         embed.add_field(name="Redis", value=redis_status, inline=True)
         embed.add_field(name="Signals in Stream", value=str(stream_length), inline=True)
-        embed.add_field(name="Guilds", value=str(len(bot.guilds)), inline=True)
-        embed.add_field(name="Users", value=str(len(bot.users)), inline=True)
+        if coordinator is None:
+            embed.add_field(name="Guilds", value=str(len(bot.guilds)), inline=True)
+            embed.add_field(name="Users", value=str(len(bot.users)), inline=True)
+        else:
+            embed.add_field(name="Guilds", value=str(cluster["guilds"]), inline=True)
+            embed.add_field(name="Members", value=str(cluster["members"]), inline=True)
         
         await ctx.send(embed=embed)
         
@@ -229,7 +245,18 @@ async def main():
         return
     
     try:
-        await bot.start(token)
+        if coordinator is None:
+            await bot.start(token)
+            return
+        # Log in first: the shard count may come from Discord's recommendation
+        await bot.login(token)
+        bot.shard_ids, bot.shard_count = await coordinator.claim_shards()
+        coordinator.start()
+        try:
+            await bot.connect()
+        finally:
+            await coordinator.stop()
+            await bot.close()
     except Exception as e:
         logger.error(f"Failed to start bot: {e}")
 
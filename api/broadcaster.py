@@ -0,0 +1,224 @@
+"""
+Push new signals from the stream to Discord channels.
+
+One background task follows the signal stream with a blocking XREAD and hands
+every entry to a sender per channel. Each sender waits a short window so a
+burst coalesces, then packs up to EMBEDS_PER_MESSAGE embeds of
+FIELDS_PER_EMBED signals into a single message. Sends are scheduled through
+token buckets for the channel's message route and the bot-wide global limit,
+so a burst becomes a few paced API calls rather than a run of 429s. A channel
+that still can't keep up drops its oldest pending signals and says so in the
+next message's footer.
+
+The reader runs even with no channels configured: its position is the
+stream's newest ID, which the bot's command caches use as their version.
+
+Environment:
+    BOT_SIGNAL_CHANNELS     comma-separated channel IDs to post to (off when unset)
+    BOT_BATCH_WINDOW        seconds to collect a burst before sending (default 1)
+    BOT_CHANNEL_BACKLOG     most pending signals kept per channel (default 500)
+"""
+import asyncio
+import datetime
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import discord
+
+from background import BackgroundService
+from signals import decode_signal
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_IDS = [int(c) for c in os.getenv("BOT_SIGNAL_CHANNELS", "").split(",") if c.strip()]
+BATCH_WINDOW = float(os.getenv("BOT_BATCH_WINDOW", "1"))
+CHANNEL_BACKLOG = int(os.getenv("BOT_CHANNEL_BACKLOG", "500"))
+
+# Discord allows 10 embeds per message; 5 fields each keeps a message well under 6000 characters
+EMBEDS_PER_MESSAGE = 10
+FIELDS_PER_EMBED = 5
+# Message create is limited to 5 per 5s per channel, and 50 requests/s per bot overall
+CHANNEL_RATE = (5, 5.0)
+GLOBAL_RATE = (50, 1.0)
+
+
+def signal_field(signal: Dict[str, Any]) -> Tuple[str, str]:
+    """Embed field (name, value) for one decoded signal."""
+    symbol = signal["symbol"] or "N/A"
+    side = signal["side"] or "N/A"
+    price = signal["price"] or "N/A"
+    formatted_time = datetime.datetime.fromtimestamp(int(signal["timestamp"]) / 1000).strftime("%Y-%m-%d %H:%M:%S")
+    return f"{symbol} - {side}", f"Price: ${price}\nTime: {formatted_time}"
+
+
+class RateLimitBucket:
+    """Token bucket allowing `capacity` calls per `per` seconds."""
+
+    def __init__(self, capacity: int, per: float):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ChannelSender(BackgroundService):
+    """Pending signals for one channel, sent in batched, rate-limited messages."""
+
+    def __init__(self, bot, channel_id: int, global_bucket: RateLimitBucket, backlog: int = CHANNEL_BACKLOG):
+        self.bot = bot
+        self.channel_id = channel_id
+        self._global_bucket = global_bucket
+        self._bucket = RateLimitBucket(*CHANNEL_RATE)
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._backlog = backlog
+        self._ready = asyncio.Event()
+        self.skipped = 0
+        self.sent_messages = 0
+        self.sent_signals = 0
+
+    def push(self, signal: Dict[str, Any]) -> None:
+        if len(self._pending) >= self._backlog:
+            self._pending.popleft()
+            self.skipped += 1
+        self._pending.append(signal)
+        self._ready.set()
+
+    def clear(self) -> None:
+        """Drop every pending signal, e.g. once another process has taken over posting."""
+        self._pending.clear()
+        self.skipped = 0
+        self._ready.clear()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        count = min(len(self._pending), EMBEDS_PER_MESSAGE * FIELDS_PER_EMBED)
+        return [self._pending.popleft() for _ in range(count)]
+
+    def _build_embeds(self, batch: List[Dict[str, Any]]) -> List[discord.Embed]:
+        embeds = []
+        for start in range(0, len(batch), FIELDS_PER_EMBED):
+            chunk = batch[start:start + FIELDS_PER_EMBED]
+            buys = sum(1 for signal in chunk if signal["side"].upper() == "BUY")
+            embed = discord.Embed(
+                title="📊 New Trading Signals" if not embeds else None,
+                color=0x00ff00 if buys * 2 >= len(chunk) else 0xff0000,
+            )
+            for signal in chunk:
+                name, value = signal_field(signal)
+                embed.add_field(name=name, value=value, inline=False)
+            embeds.append(embed)
+        if self.skipped:
+            embeds[-1].set_footer(text=f"{self.skipped} older signals skipped to keep up")
+            self.skipped = 0
+        return embeds
+
+    @property
+    def task_name(self) -> str:
+        return f"broadcast:{self.channel_id}"
+
+    async def _channel(self):
+        return self.bot.get_channel(self.channel_id) or await self.bot.fetch_channel(self.channel_id)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._ready.wait()
+                # Let the rest of a burst arrive so it shares messages
+                await asyncio.sleep(BATCH_WINDOW)
+                channel = await self._channel()
+                while self._pending:
+                    await self._bucket.acquire()
+                    await self._global_bucket.acquire()
+                    batch = self._take_batch()
+                    await channel.send(embeds=self._build_embeds(batch))
+                    self.sent_messages += 1
+                    self.sent_signals += len(batch)
+                self._ready.clear()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error posting signals to channel {self.channel_id}: {e}")
+                await asyncio.sleep(5)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "sent_messages": self.sent_messages,
+            "sent_signals": self.sent_signals,
+        }
+
+
+class SignalBroadcaster(BackgroundService):
+    """Follows the signal stream and fans new entries out to the channel senders."""
+
+    task_name = "broadcast:reader"
+
+    def __init__(
+        self,
+        bot,
+        get_client: Callable[[], Awaitable],
+        stream_key: str,
+        channel_ids: List[int] = CHANNEL_IDS,
+        block_ms: int = 1000,
+    ):
+        self._get_client = get_client
+        self.stream_key = stream_key
+        self._block_ms = block_ms
+        global_bucket = RateLimitBucket(*GLOBAL_RATE)
+        self.senders = {channel_id: ChannelSender(bot, channel_id, global_bucket) for channel_id in channel_ids}
+        # Resolved to the stream's newest ID on start, so only later signals are posted
+        self._last_id: Optional[str] = None
+
+    @property
+    def newest_id(self) -> Optional[str]:
+        """Newest stream ID seen, or None while the reader isn't following the stream."""
+        return self._last_id if self.running else None
+
+    def start(self) -> None:
+        for sender in self.senders.values():
+            sender.start()
+        super().start()
+
+    async def stop(self) -> None:
+        await super().stop()
+        for sender in self.senders.values():
+            await sender.stop()
+            sender.clear()
+        # Whoever posts next starts from the stream tail; anything pending here is
+        # posted by the process that takes over, and must not be re-posted on re-election
+        self._last_id = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                client = await self._get_client()
+                if self._last_id is None:
+                    newest = await client.xrevrange(self.stream_key, count=1)
+                    self._last_id = newest[0][0] if newest else "0-0"
+                messages = await client.xread({self.stream_key: self._last_id}, block=self._block_ms)
+                for _, entries in messages:
+                    for entry_id, fields in entries:
+                        signal = decode_signal(entry_id, fields)
+                        for sender in self.senders.values():
+                            sender.push(signal)
+                    if entries:
+                        self._last_id = entries[-1][0]
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reading {self.stream_key} for broadcast: {e}")
+                await asyncio.sleep(1)
@@ -0,0 +1,44 @@
+"""
+Server-side signal filters for /sse/signals and /signals/latest.
+"""
+from typing import FrozenSet, Optional
+
+from signals import Signal
+from symbols import normalize_symbol
+
+
+def _split(value: Optional[str]) -> FrozenSet[str]:
+    if not value:
+        return frozenset()
+    return frozenset(part.strip() for part in value.split(",") if part.strip())
+
+
+class SignalFilter:
+    """Matches signals by symbol, side and strategy. Empty criteria match everything."""
+
+    __slots__ = ("symbols", "sides", "strategies")
+
+    def __init__(self, symbols=(), sides=(), strategies=()):
+        self.symbols: FrozenSet[str] = frozenset(normalize_symbol(s) for s in symbols)
+        self.sides: FrozenSet[str] = frozenset(s.upper() for s in sides)
+        self.strategies: FrozenSet[str] = frozenset(s.lower() for s in strategies)
+
+    @classmethod
+    def from_params(
+        cls, symbol: Optional[str] = None, side: Optional[str] = None, strategy: Optional[str] = None
+    ) -> "SignalFilter":
+        """Build a filter from comma-separated query parameter values."""
+        return cls(_split(symbol), _split(side), _split(strategy))
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.symbols or self.sides or self.strategies)
+
+    def matches(self, signal: Signal) -> bool:
+        if self.symbols and signal.symbol not in self.symbols:
+            return False
+        if self.sides and signal.side not in self.sides:
+            return False
+        if self.strategies and signal.fields.get("strategy", "").lower() not in self.strategies:
+            return False
+        return True
@@ -0,0 +1,131 @@
+"""
+Content negotiation for bulk signal responses.
+
+Clients pick a body format with `format=` or the Accept header (JSON by default,
+newline-delimited JSON, or MessagePack) and a compression with Accept-Encoding
+(brotli, then gzip). NDJSON bodies are streamed and compressed as they are
+produced. msgpack and brotli are optional; without them those choices are
+unavailable and gzip/JSON are used instead.
+"""
+import zlib
+from typing import AsyncIterator, Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+from signals import Signal
+
+JSON = "json"
+NDJSON = "ndjson"
+MSGPACK = "msgpack"
+
+MEDIA_TYPES = {
+    JSON: "application/json",
+    NDJSON: "application/x-ndjson",
+    MSGPACK: "application/msgpack",
+}
+
+_ACCEPT_TYPES = {
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised when the requested format is unknown or its library isn't installed."""
+
+
+def negotiate_format(format_param: Optional[str], accept: Optional[str]) -> str:
+    if format_param:
+        fmt = format_param.lower()
+        if fmt not in MEDIA_TYPES:
+            raise UnsupportedFormatError(f"Unknown format {format_param!r}; expected one of {list(MEDIA_TYPES)}")
+    else:
+        fmt = JSON
+        for part in (accept or "").split(","):
+            media_type = part.split(";")[0].strip().lower()
+            if media_type in _ACCEPT_TYPES:
+                fmt = _ACCEPT_TYPES[media_type]
+                break
+    if fmt == MSGPACK and msgpack is None:
+        raise UnsupportedFormatError("MessagePack output requires the msgpack package")
+    return fmt
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(coding.strip().lower())
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+    return body
+
+
+def choose_encoding(body: bytes, accept_encoding: Optional[str]) -> Optional[str]:
+    if len(body) < MIN_COMPRESS_SIZE:
+        return None
+    return negotiate_encoding(accept_encoding)
+
+
+async def compress_stream(chunks: AsyncIterator[bytes], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    """Compress a streamed body, flushing after every chunk so clients can parse as it arrives."""
+    if encoding is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=5)
+        async for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def ndjson_lines(signals: Iterable[Signal]) -> bytes:
+    return b"".join(signal.json + b"\n" for signal in signals)
+
+
+def encode_msgpack(signals, **extra) -> bytes:
+    """MessagePack counterpart of signals.encode_signals."""
+    signals = list(signals)
+    packer = msgpack.Packer()
+    body = [packer.pack_map_header(2 + len(extra)), packer.pack("signals"), packer.pack_array_header(len(signals))]
+    body.extend(packer.pack(signal.data) for signal in signals)
+    body.append(packer.pack("count"))
+    body.append(packer.pack(len(signals)))
+    for key, value in extra.items():
+        body.append(packer.pack(key))
+        body.append(packer.pack(value))
+    return b"".join(body)
@@ -0,0 +1,159 @@
+"""
+Cursor-paginated reads over a time range of a signal stream.
+
+Pages are read with XRANGE in bounded chunks, so walking a long history keeps
+server memory constant regardless of how much of the stream a client reads.
+Cursors are opaque to clients: base64url JSON holding the stream, the last ID
+returned and the end of the requested range.
+
+With retention enabled, the part of a range older than the Redis hot window is
+read from the on-disk archive first, and the scan continues on the stream
+after the last archived ID it returned.
+"""
+import asyncio
+import base64
+import binascii
+import os
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Tuple
+
+import orjson
+
+from filters import SignalFilter
+from hub import parse_stream_id
+from signals import Signal
+
+if TYPE_CHECKING:
+    from archive import ArchiveStore
+
+MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE", "1000"))
+# Streamed (NDJSON) exports hold one chunk at a time, so they may run longer
+MAX_EXPORT_SIZE = int(os.getenv("HISTORY_MAX_EXPORT", "100000"))
+CHUNK_SIZE = int(os.getenv("HISTORY_CHUNK_SIZE", "200"))
+# Most entries scanned per page when a filter matches only a few of them
+SCAN_MAX = int(os.getenv("FILTER_SCAN_MAX", "10000"))
+
+
+class InvalidRangeError(ValueError):
+    """Raised for malformed range bounds or cursors."""
+
+
+def parse_bound(value: Optional[str], default: str) -> str:
+    """Validate a range bound given as a stream ID or epoch milliseconds."""
+    if value is None or value == "":
+        return default
+    value = value.strip()
+    if value in ("-", "+"):
+        return value
+    parsed = parse_stream_id(value)
+    if parsed is None or min(parsed) < 0:
+        raise InvalidRangeError(f"Invalid range bound {value!r}; expected a stream ID or epoch ms")
+    # Re-rendered so lenient forms ("123-", "+5") reach Redis as IDs it accepts;
+    # bare ms stays bare, since as an end bound it covers every sequence number
+    ms, seq = parsed
+    return f"{ms}-{seq}" if "-" in value else str(ms)
+
+
+def encode_cursor(stream_key: str, after: str, end: str) -> str:
+    payload = orjson.dumps({"s": stream_key, "a": after, "e": end})
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, stream_key: str) -> Tuple[str, str]:
+    """Return the (exclusive start, end) a cursor continues from."""
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        after, end = payload["a"], payload["e"]
+        cursor_stream = payload["s"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidRangeError("Invalid cursor")
+    if cursor_stream != stream_key:
+        raise InvalidRangeError("Cursor belongs to a different stream")
+    return f"({parse_bound(after, '-')}", parse_bound(end, "+")
+
+
+class RangeScan:
+    """Walks [start, end] of a stream in XRANGE chunks, yielding matching signals.
+
+    After iteration, `next_cursor` continues the scan, or is None once the range
+    is exhausted. Only one chunk is held in memory at a time.
+    """
+
+    def __init__(
+        self,
+        client,
+        stream_key: str,
+        start: str,
+        end: str,
+        limit: int,
+        signal_filter: SignalFilter,
+        max_limit: int = MAX_PAGE_SIZE,
+        archive: Optional["ArchiveStore"] = None,
+    ):
+        self._client = client
+        self._archive = archive
+        self.stream_key = stream_key
+        self._start = start
+        self._end = end
+        self.limit = max(1, min(limit, max_limit))
+        self._filter = signal_filter
+        self.next_cursor: Optional[str] = None
+
+    async def chunks(self) -> AsyncIterator[List[Signal]]:
+        matched = 0
+        scanned = 0
+        last_id = None
+        start = self._start
+        # A filter may match only a few entries, so bound how far one request scans
+        scan_max = max(SCAN_MAX, self.limit)
+        archived = self._archive.read_range(self.stream_key, start, self._end) if self._archive else None
+        while matched < self.limit and scanned < scan_max:
+            chunk = min(CHUNK_SIZE, self.limit - matched) if self._filter.is_empty else CHUNK_SIZE
+            entries = None
+            if archived is not None:
+                # Archive blocks are decompressed off the event loop
+                entries = await asyncio.to_thread(next, archived, None)
+                if entries is None:
+                    archived = None
+            if entries is None:
+                entries = await self._client.xrange(self.stream_key, min=start, max=self._end, count=chunk)
+                if not entries:
+                    return
+                live = True
+            else:
+                live = False
+            scanned += len(entries)
+            batch = []
+            for entry_id, fields in entries:
+                last_id = entry_id
+                signal = Signal(entry_id, fields)
+                if self._filter.matches(signal):
+                    batch.append(signal)
+                    matched += 1
+                    if matched == self.limit:
+                        break
+            if batch:
+                yield batch
+            if live and len(entries) < chunk and matched < self.limit:
+                return
+            start = f"({last_id}"
+        self.next_cursor = encode_cursor(self.stream_key, last_id, self._end)
+
+
+async def read_page(
+    client,
+    stream_key: str,
+    start: str,
+    end: str,
+    limit: int,
+    signal_filter: SignalFilter,
+    archive: Optional["ArchiveStore"] = None,
+) -> Tuple[List[Signal], Optional[str]]:
+    """Read up to `limit` matching signals in [start, end], oldest first.
+
+    Returns the page and the cursor for the next one, or None once the range is exhausted.
+    """
+    scan = RangeScan(client, stream_key, start, end, limit, signal_filter, archive=archive)
+    page: List[Signal] = []
+    async for batch in scan.chunks():
+        page.extend(batch)
+    return page, scan.next_cursor
@@ -0,0 +1,423 @@
+"""
+Single-reader fan-out hub for Redis signal streams.
+
+One background StreamReader task issues a single multiplexed XREAD covering
+every stream in use and hands each entry to that stream's StreamHub, which
+pushes it to every connected SSE client through its own bounded Subscriber
+queue. Redis sees one blocking reader no matter how many streams or clients
+are active (one per hash slot on a Redis Cluster), and a slow client never
+blocks the reader. Subscribers that filter on symbol are indexed by canonical
+symbol, so dispatching an entry only touches the clients interested in it.
+
+In-process consumers of streams that aren't served to clients (metric
+streams) register a StreamFollower instead: it catches up with chunked XRANGE
+and then rides the same XREAD, so they don't hold blocking connections of
+their own.
+
+Each hub also keeps a bounded ring buffer of recent entries so reconnecting
+clients can resume from their Last-Event-ID without touching Redis. Older gaps
+are read forward from Redis in pages; one larger than SSE_REPLAY_MAX entries is
+not replayed but reported, so the client can backfill from /signals/history.
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from background import BackgroundService
+from filters import SignalFilter
+from signals import Signal
+from subscriber import Subscriber
+
+logger = logging.getLogger(__name__)
+
+# Called with a batch of signals (oldest first); reset=True when the hub (re)primes
+Listener = Callable[[List[Signal], bool], None]
+
+# Called with a stream key and a batch of its raw entries (oldest first)
+EntryHandler = Callable[[str, List[Tuple[str, Dict[str, str]]]], None]
+
+BUFFER_SIZE = int(os.getenv("SSE_REPLAY_BUFFER", "1000"))
+LOAD_CHUNK = 1000
+REPLAY_MAX = int(os.getenv("SSE_REPLAY_MAX", "10000"))
+
+# Entries a resuming client missed but won't be replayed: exclusive (after, before) IDs
+ReplayGap = Tuple[str, str]
+
+
+def parse_stream_id(entry_id: str) -> Optional[Tuple[int, int]]:
+    """Parse a Redis stream ID ("<ms>-<seq>" or "<ms>") into a comparable tuple."""
+    try:
+        ms, _, seq = entry_id.strip().partition("-")
+        return int(ms), int(seq or 0)
+    except (AttributeError, ValueError):
+        return None
+
+
+class StreamHub:
+    """Buffers one Redis stream's entries and broadcasts them to subscriber queues."""
+
+    def __init__(
+        self,
+        get_client: Callable[[], Awaitable],
+        stream_key: str,
+        buffer_size: int = BUFFER_SIZE,
+    ):
+        self.stream_key = stream_key
+        self._get_client = get_client
+        self._subscribers: Set[Subscriber] = set()
+        # Subscribers with a symbol filter, by canonical symbol; the rest take everything
+        self._by_symbol: Dict[str, Set[Subscriber]] = {}
+        self._any_symbol: Set[Subscriber] = set()
+        self._listeners: List[Listener] = []
+        self._buffer: Deque[Signal] = deque(maxlen=buffer_size)
+        self._prime_lock = asyncio.Lock()
+        # ID the reader continues from; None until the hub has been primed
+        self.last_id: Optional[str] = None
+        self.replay_buffer_hits = 0
+        self.replay_redis_reads = 0
+        # Frame counters of subscribers that have left; live ones are added at read time
+        self._retired_sent = 0
+        self._retired_dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def subscribe(
+        self,
+        last_event_id: Optional[str] = None,
+        signal_filter: Optional[SignalFilter] = None,
+        **subscriber_kwargs,
+    ) -> Tuple[Subscriber, List[Signal], Optional[ReplayGap]]:
+        """Register a client and return the entries it missed since last_event_id.
+
+        The buffer snapshot and queue registration happen without yielding to the
+        event loop, so replayed entries and live entries never overlap or leave a gap.
+        When the missed entries older than the buffer exceed REPLAY_MAX, only the
+        buffered ones are returned, along with the range that was skipped.
+        """
+        await self.ensure_primed()
+
+        subscriber = Subscriber(signal_filter=signal_filter, **subscriber_kwargs)
+        self._add(subscriber)
+        signal_filter = subscriber.signal_filter
+
+        last = parse_stream_id(last_event_id) if last_event_id else None
+        buffered = list(self._buffer)
+        # An empty buffer means the stream has been empty since priming: nothing was missed
+        if last is None or not buffered:
+            return subscriber, [], None
+
+        missed = [
+            signal for signal in buffered
+            if parse_stream_id(signal.id) > last and signal_filter.matches(signal)
+        ]
+        if parse_stream_id(buffered[0].id) <= last:
+            self.replay_buffer_hits += 1
+            return subscriber, missed, None
+
+        # The gap reaches back past the buffer: read the older part forward from Redis.
+        # Live entries are all newer than the buffer, so the queue can fill meanwhile.
+        self.replay_redis_reads += 1
+        try:
+            older = await self._read_gap(f"({last_event_id.strip()}", f"({buffered[0].id}", signal_filter)
+        except Exception:
+            self.unsubscribe(subscriber)
+            raise
+        if older is None:
+            return subscriber, missed, (last_event_id.strip(), buffered[0].id)
+        return subscriber, older + missed, None
+
+    async def _read_gap(self, start: str, end: str, signal_filter: SignalFilter) -> Optional[List[Signal]]:
+        """Matching entries in [start, end], oldest first, or None if there are over REPLAY_MAX."""
+        client = await self._get_client()
+        page_size = self._buffer.maxlen
+        matched: List[Signal] = []
+        read = 0
+        while True:
+            entries = await client.xrange(self.stream_key, min=start, max=end, count=page_size)
+            read += len(entries)
+            if read > REPLAY_MAX:
+                return None
+            matched.extend(
+                signal for signal in (Signal(entry_id, fields) for entry_id, fields in entries)
+                if signal_filter.matches(signal)
+            )
+            if len(entries) < page_size:
+                return matched
+            start = f"({entries[-1][0]}"
+
+    def _add(self, subscriber: Subscriber) -> None:
+        self._subscribers.add(subscriber)
+        symbols = subscriber.signal_filter.symbols
+        if not symbols:
+            self._any_symbol.add(subscriber)
+        for symbol in symbols:
+            self._by_symbol.setdefault(symbol, set()).add(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber not in self._subscribers:
+            return
+        self._subscribers.discard(subscriber)
+        self._retired_sent += subscriber.sent
+        self._retired_dropped += subscriber.dropped
+        self._any_symbol.discard(subscriber)
+        for symbol in subscriber.signal_filter.symbols:
+            interested = self._by_symbol.get(symbol)
+            if interested is not None:
+                interested.discard(subscriber)
+                if not interested:
+                    del self._by_symbol[symbol]
+
+    def subscriber_stats(self) -> List[Dict]:
+        return [subscriber.stats() for subscriber in self._subscribers]
+
+    def delivery_totals(self) -> Tuple[int, int]:
+        """Frames sent and signals dropped over every subscriber this hub has had."""
+        sent, dropped = self._retired_sent, self._retired_dropped
+        for subscriber in self._subscribers:
+            sent += subscriber.sent
+            dropped += subscriber.dropped
+        return sent, dropped
+
+    def add_listener(self, listener: Listener) -> None:
+        """Register an in-process consumer that sees every entry the reader receives."""
+        self._listeners.append(listener)
+
+    def _notify(self, entries: List[Signal], reset: bool = False) -> None:
+        for listener in self._listeners:
+            try:
+                listener(entries, reset)
+            except Exception as e:
+                logger.error(f"Hub listener failed on {self.stream_key}: {e}")
+
+    def _broadcast(self, signal: Signal) -> None:
+        self._buffer.append(signal)
+        closed = []
+        for interested in (self._any_symbol, self._by_symbol.get(signal.symbol, ())):
+            for subscriber in interested:
+                if subscriber.signal_filter.matches(signal) and not subscriber.push(signal):
+                    closed.append(subscriber)
+        for subscriber in closed:
+            logger.warning(f"Disconnecting slow subscriber {subscriber.id} on {self.stream_key}")
+            self.unsubscribe(subscriber)
+
+    @property
+    def primed(self) -> bool:
+        return self.last_id is not None
+
+    async def ensure_primed(self) -> None:
+        """Seed the ring buffer with the newest entries the first time the stream is used."""
+        async with self._prime_lock:
+            if self.primed:
+                return
+            client = await self._get_client()
+            entries = await client.xrevrange(self.stream_key, count=self._buffer.maxlen)
+            self._buffer.clear()
+            self._buffer.extend(Signal(entry_id, fields) for entry_id, fields in reversed(entries))
+            self._notify(list(self._buffer), reset=True)
+            # An empty stream is read from the beginning so nothing published meanwhile is skipped
+            self.last_id = entries[0][0] if entries else "0-0"
+
+    def dispatch(self, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        """Handle a batch of raw entries read by the StreamReader."""
+        # Decode and encode once here; subscribers only ever copy bytes
+        batch = [Signal(entry_id, fields) for entry_id, fields in entries]
+        for signal in batch:
+            self._broadcast(signal)
+        if batch:
+            self.last_id = batch[-1].id
+        self._notify(batch)
+
+
+class StreamFollower:
+    """Raw entries of one or more streams from a start ID on, for an in-process consumer.
+
+    The follower first catches up with chunked XRANGE on a regular connection;
+    once loaded, the StreamReader includes its streams in the shared XREAD from
+    the last entry handed over. Its streams must not also have a StreamHub.
+    """
+
+    def __init__(
+        self,
+        get_client: Callable[[], Awaitable],
+        streams: Iterable[str],
+        handler: EntryHandler,
+        start: Callable[[], str] = lambda: "-",
+    ):
+        self._get_client = get_client
+        self._handler = handler
+        # Where loading begins: "-" or epoch milliseconds, evaluated when loading starts
+        self._start = start
+        # ID each stream continues after; None until loading has reached it
+        self.last_ids: Dict[str, Optional[str]] = {stream: None for stream in streams}
+        self.loaded = False
+
+    def dispatch(self, stream: str, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        if not entries:
+            return
+        self.last_ids[stream] = entries[-1][0]
+        try:
+            self._handler(stream, entries)
+        except Exception as e:
+            logger.error(f"Follower handler failed on {stream}: {e}")
+
+    async def _load(self) -> None:
+        client = await self._get_client()
+        since = self._start()
+        for stream, last in self.last_ids.items():
+            # Resumes after the last handed-over entry if an earlier attempt failed part way
+            start = since if last is None else f"({last}"
+            while True:
+                entries = await client.xrange(stream, min=start, count=LOAD_CHUNK)
+                self.dispatch(stream, entries)
+                if len(entries) < LOAD_CHUNK:
+                    break
+                start = f"({entries[-1][0]}"
+            if self.last_ids[stream] is None:
+                # Nothing to load: follow from the start bound rather than the stream's beginning
+                self.last_ids[stream] = "0-0" if since == "-" else f"{since}-0"
+        self.loaded = True
+
+    async def catch_up(self) -> None:
+        """Load until caught up, retrying after errors."""
+        while not self.loaded:
+            try:
+                await self._load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error loading {list(self.last_ids)}: {e}")
+                await asyncio.sleep(1)
+
+
+class StreamReader(BackgroundService):
+    """Owns the blocking XREAD shared by every primed StreamHub and loaded StreamFollower.
+
+    `slot_of` maps a stream key to the hash slot its XREAD is confined to (None
+    outside a Redis Cluster); streams in different slots are read by separate
+    XREAD loops, since a cluster rejects a multi-key command spanning slots.
+    """
+
+    task_name = "hub:reader"
+
+    def __init__(
+        self,
+        get_client: Callable[[], Awaitable],
+        block_ms: int = 1000,
+        get_blocking_client: Optional[Callable[[], Awaitable]] = None,
+        slot_of: Callable[[str], Optional[int]] = lambda key: None,
+    ):
+        self._get_client = get_client
+        # XREAD BLOCK holds its connection for up to block_ms, so it gets its own pool
+        self._get_blocking_client = get_blocking_client or get_client
+        self._block_ms = block_ms
+        self._slot_of = slot_of
+        self._hubs: Dict[str, StreamHub] = {}
+        self._followers: Dict[str, StreamFollower] = {}
+        self._loading: List[asyncio.Task] = []
+
+    def hub(self, stream_key: str) -> StreamHub:
+        """Return the hub for a stream, creating it on first use."""
+        stream_hub = self._hubs.get(stream_key)
+        if stream_hub is None:
+            stream_hub = self._hubs[stream_key] = StreamHub(self._get_client, stream_key)
+        self.start()
+        return stream_hub
+
+    def follow(self, follower: StreamFollower) -> None:
+        """Load a follower in the background, then read its streams on the shared XREAD."""
+        for stream in follower.last_ids:
+            self._followers[stream] = follower
+        self._loading.append(asyncio.create_task(follower.catch_up(), name="hub:follower-load"))
+        self.start()
+
+    @property
+    def hubs(self) -> Dict[str, StreamHub]:
+        return self._hubs
+
+    async def stop(self) -> None:
+        for task in self._loading:
+            task.cancel()
+        self._loading.clear()
+        await super().stop()
+
+    def _ready_streams(self) -> Dict[str, str]:
+        """Stream → ID to read after, for every primed hub and loaded follower."""
+        streams = {key: h.last_id for key, h in self._hubs.items() if h.primed}
+        streams.update((key, f.last_ids[key]) for key, f in self._followers.items() if f.loaded)
+        return streams
+
+    async def _run(self) -> None:
+        # One XREAD loop per hash slot in use; a single loop (slot None) outside a cluster
+        loops: Dict[Optional[int], asyncio.Task] = {}
+        try:
+            while True:
+                for slot in {self._slot_of(key) for key in self._ready_streams()} - loops.keys():
+                    loops[slot] = asyncio.create_task(self._read(slot), name=f"{self.task_name}:{slot}")
+                await asyncio.sleep(self._block_ms / 1000)
+        finally:
+            for task in loops.values():
+                task.cancel()
+            await asyncio.gather(*loops.values(), return_exceptions=True)
+
+    async def _read(self, slot: Optional[int]) -> None:
+        streams: Dict[str, str] = {}
+        while True:
+            try:
+                # Streams are picked up once primed or loaded; newcomers join on the next round
+                streams = {key: last for key, last in self._ready_streams().items() if self._slot_of(key) == slot}
+                if not streams:
+                    await asyncio.sleep(self._block_ms / 1000)
+                    continue
+                client = await self._get_blocking_client()
+                messages = await client.xread(streams, block=self._block_ms)
+                for stream, entries in messages:
+                    if stream in self._hubs:
+                        self._hubs[stream].dispatch(entries)
+                    else:
+                        self._followers[stream].dispatch(stream, entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reading streams {list(streams)}: {e}")
+                await asyncio.sleep(1)
+
+
+_reader: Optional[StreamReader] = None
+
+
+def get_reader(
+    get_client: Callable[[], Awaitable],
+    get_blocking_client: Optional[Callable[[], Awaitable]] = None,
+    slot_of: Callable[[str], Optional[int]] = lambda key: None,
+) -> StreamReader:
+    """Return the process-wide StreamReader, creating it on first use."""
+    global _reader
+    if _reader is None:
+        _reader = StreamReader(get_client, get_blocking_client=get_blocking_client, slot_of=slot_of)
+    return _reader
+
+
+def get_hub(
+    get_client: Callable[[], Awaitable],
+    stream_key: str,
+    get_blocking_client: Optional[Callable[[], Awaitable]] = None,
+    slot_of: Callable[[str], Optional[int]] = lambda key: None,
+) -> StreamHub:
+    """Return the shared hub for a stream, creating it on first use."""
+    return get_reader(get_client, get_blocking_client, slot_of).hub(stream_key)
+
+
+def hubs() -> Dict[str, StreamHub]:
+    """Every hub created so far, by stream key."""
+    return _reader.hubs if _reader is not None else {}
+
+
+async def stop_all() -> None:
+    global _reader
+    if _reader is not None:
+        await _reader.stop()
+        _reader = None
@@ -0,0 +1,169 @@
+"""
+Streaming latency percentiles for /slo/latency.
+
+A StreamFollower on the shared hub reader follows `metrics:signals:e2e` and
+`metrics:md:lag`, starting 24h back, and adds every sample to log-bucketed
+quantile sketches (DDSketch-style: fixed bucket boundaries with ~1% relative
+error), one per agent/consumer and stream. The sketches are kept per minute
+and per hour in rings, so a window's percentile is the element-wise sum of a
+few count arrays and a cumulative search rather than a sort over raw
+samples, and windows are not limited by stream length.
+"""
+import logging
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from hub import StreamFollower
+
+logger = logging.getLogger(__name__)
+
+E2E_STREAM = os.getenv("SLO_E2E_STREAM", "metrics:signals:e2e")
+LAG_STREAM = os.getenv("SLO_LAG_STREAM", "metrics:md:lag")
+# Stream -> (latency field, field naming the producer)
+SOURCES: Dict[str, Tuple[str, str]] = {
+    E2E_STREAM: ("ms", "agent"),
+    LAG_STREAM: ("lag", "consumer"),
+}
+
+RELATIVE_ACCURACY = 0.01
+MIN_VALUE_MS = 0.01
+MAX_VALUE_MS = 1e7
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Window name -> (ring, number of its slots summed)
+WINDOWS: Dict[str, Tuple[str, int]] = {
+    "5m": ("minute", 5),
+    "1h": ("minute", 60),
+    "24h": ("hour", 24),
+}
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_OFFSET = math.ceil(math.log(MIN_VALUE_MS) / _LOG_GAMMA)
+BUCKETS = math.ceil(math.log(MAX_VALUE_MS) / _LOG_GAMMA) - _OFFSET + 2
+# Representative value of each bucket; bucket 0 collects everything below MIN_VALUE_MS
+_VALUES = np.array(
+    [0.0] + [2 * _GAMMA ** (i + _OFFSET) / (_GAMMA + 1) for i in range(BUCKETS - 1)]
+)
+
+
+def bucket_index(value_ms: float) -> int:
+    if value_ms < MIN_VALUE_MS:
+        return 0
+    value_ms = min(value_ms, MAX_VALUE_MS)
+    return math.ceil(math.log(value_ms) / _LOG_GAMMA) - _OFFSET + 1
+
+
+def quantiles(counts: np.ndarray, qs=QUANTILES) -> List[Optional[float]]:
+    """Value at each quantile of a merged count array (None when it holds no samples)."""
+    cumulative = np.cumsum(counts)
+    total = int(cumulative[-1]) if len(cumulative) else 0
+    if not total:
+        return [None for _ in qs]
+    ranks = [max(1, math.ceil(q * total)) for q in qs]
+    indices = np.searchsorted(cumulative, ranks)
+    return [round(float(_VALUES[i]), 2) for i in indices]
+
+
+class SketchRing:
+    """Per-slot bucket counts for the most recent `slots` periods of `width` seconds."""
+
+    __slots__ = ("slots", "width", "epochs", "counts", "maxima")
+
+    def __init__(self, slots: int, width: int):
+        self.slots = slots
+        self.width = width
+        self.epochs = np.full(slots, -1, dtype=np.int64)
+        self.counts = np.zeros((slots, BUCKETS), dtype=np.int32)
+        self.maxima = np.zeros(slots, dtype=np.float64)
+
+    def add(self, ts: float, bucket: int, value_ms: float) -> None:
+        epoch = int(ts // self.width)
+        i = epoch % self.slots
+        if self.epochs[i] != epoch:
+            if self.epochs[i] > epoch:
+                return  # older than the window this slot covers now
+            self.epochs[i] = epoch
+            self.counts[i] = 0
+            self.maxima[i] = 0.0
+        self.counts[i, bucket] += 1
+        if value_ms > self.maxima[i]:
+            self.maxima[i] = value_ms
+
+    def merged(self, now: float, last: int) -> Tuple[np.ndarray, float]:
+        """Summed counts and maximum over the `last` periods ending now."""
+        live = self.epochs >= int(now // self.width) - last + 1
+        if not live.any():
+            return np.zeros(BUCKETS, dtype=np.int64), 0.0
+        return self.counts[live].sum(axis=0, dtype=np.int64), float(self.maxima[live].max())
+
+
+class LatencySketch:
+    """Minute and hour sketch rings for one (metric stream, producer, target stream)."""
+
+    __slots__ = ("rings",)
+
+    def __init__(self):
+        self.rings = {"minute": SketchRing(60, 60), "hour": SketchRing(24, 3600)}
+
+    def add(self, ts: float, value_ms: float) -> None:
+        bucket = bucket_index(value_ms)
+        for ring in self.rings.values():
+            ring.add(ts, bucket, value_ms)
+
+    def summary(self, window: str, now: float) -> Dict[str, Any]:
+        ring, last = WINDOWS[window]
+        counts, maximum = self.rings[ring].merged(now, last)
+        # A bucket's representative value may overshoot the largest sample in it
+        p50, p95, p99 = (min(p, maximum) if p is not None else None for p in quantiles(counts))
+        return {"count": int(counts.sum()), "p50": p50, "p95": p95, "p99": p99, "max": maximum or None}
+
+
+class LatencyTracker:
+    """Follows the SLO metric streams and keeps a sketch per producer and target stream."""
+
+    def __init__(self, get_client: Callable[[], Awaitable]):
+        self._sketches: Dict[Tuple[str, str, str], LatencySketch] = {}
+        self.samples = 0
+        # The longest window's worth of history, then live; registered with the hub reader at startup
+        self.follower = StreamFollower(
+            get_client, SOURCES, self._apply_batch, start=lambda: str(int((time.time() - 86400) * 1000))
+        )
+
+    @property
+    def loaded(self) -> bool:
+        return self.follower.loaded
+
+    def _apply_batch(self, stream: str, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        for entry_id, fields in entries:
+            self._apply(stream, entry_id, fields)
+
+    def _apply(self, stream: str, entry_id: str, fields: Dict[str, str]) -> None:
+        value_field, producer_field = SOURCES[stream]
+        try:
+            value_ms = float(fields[value_field])
+            ts = int(fields.get("ts") or entry_id.split("-")[0]) / 1000
+        except (KeyError, ValueError):
+            return
+        key = (stream, fields.get(producer_field, ""), fields.get("stream", ""))
+        sketch = self._sketches.get(key)
+        if sketch is None:
+            sketch = self._sketches[key] = LatencySketch()
+        sketch.add(ts, value_ms)
+        self.samples += 1
+
+    def summary(self, windows=tuple(WINDOWS), now: Optional[float] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Percentiles per metric stream, producer and target stream for each window."""
+        now = time.time() if now is None else now
+        result: Dict[str, List[Dict[str, Any]]] = {stream: [] for stream in SOURCES}
+        for (stream, producer, target), sketch in sorted(self._sketches.items()):
+            result[stream].append({
+                SOURCES[stream][1]: producer,
+                "stream": target,
+                "windows": {window: sketch.summary(window, now) for window in windows},
+            })
+        return result
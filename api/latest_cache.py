@@ -0,0 +1,71 @@
+"""
+In-process cache of the newest decoded signals for /signals/latest.
+
+The cache is fed by the stream hub's reader: it is reset when the reader
+primes and appended when a new stream ID arrives, so polling requests are
+served from memory without an XREVRANGE per request.
+"""
+import os
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional
+
+from filters import SignalFilter
+from signals import Signal
+
+CACHE_SIZE = int(os.getenv("LATEST_CACHE_SIZE", "500"))
+
+
+class LatestCache:
+    """Holds the newest encoded signals, oldest first."""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self._signals: Deque[Signal] = deque(maxlen=size)
+        self._ready = False
+        # True while the cache holds every entry in the stream, so any limit can be served
+        self._complete = False
+        self.newest_id: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, signals: List[Signal], reset: bool = False) -> None:
+        """Hub listener: apply a batch of signals, oldest first."""
+        if reset:
+            self._signals.clear()
+            self._complete = len(signals) < self._signals.maxlen
+            self._ready = True
+        for signal in signals:
+            if len(self._signals) == self._signals.maxlen:
+                self._complete = False
+            self._signals.append(signal)
+            self.newest_id = signal.id
+
+    def get(self, limit: int, signal_filter: Optional[SignalFilter] = None) -> Optional[List[Signal]]:
+        """Return the newest `limit` matching signals oldest-first, or None if the cache can't answer."""
+        if not self._ready:
+            self.misses += 1
+            return None
+        limit = max(limit, 0)
+        if signal_filter is None or signal_filter.is_empty:
+            if limit > len(self._signals) and not self._complete:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(islice(self._signals, len(self._signals) - min(limit, len(self._signals)), None))
+
+        matched = list(islice((s for s in reversed(self._signals) if signal_filter.matches(s)), limit))
+        if len(matched) < limit and not self._complete:
+            self.misses += 1
+            return None
+        self.hits += 1
+        matched.reverse()
+        return matched
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._signals),
+            "capacity": self._signals.maxlen,
+            "newest_id": self.newest_id,
+        }
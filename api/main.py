@@ -1,12 +1,28 @@
 import os
-import asyncio
-from typing import List, Dict, Any
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+import hashlib
+import time
+from typing import List, Dict, Any, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import redis.asyncio as redis
 import orjson
 
+import archive
+import formats
+import hub
+import history
+import metrics
+from filters import SignalFilter
+from redis_pool import TimedRedis, clients as redis_clients, get_blocking_client, get_read_client, get_redis_client, xread_slot
+from latency import LatencyTracker, WINDOWS as LATENCY_WINDOWS
+from pnl import EquityCurve, MAX_POINTS as PNL_MAX_POINTS
+from latest_cache import LatestCache, CACHE_SIZE
+from signals import Signal, encode_signals
+from stats import SignalStats
+from symbol_index import SymbolIndex
+from streams import SIGNAL_STREAMS, AliasResolver, UnknownStreamError, cache_control
+from subscriber import SlowConsumerError
+
 app = FastAPI(title="Signals API", version="1.0.0")
 
 # CORS middleware
@@ -18,120 +34,412 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Redis connection
-redis_client = None
+# Request counts and latency by route template, served on /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+TimedRedis.observer = metrics.observe_redis_command
+loop_lag = metrics.LoopLagMonitor()
 
-async def get_redis_client():
-    global redis_client
-    if redis_client is None:
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        ssl = os.getenv("REDIS_SSL", "false").lower() == "true"
-        ca_cert_use_certifi = os.getenv("REDIS_CA_CERT_USE_CERTIFI", "false").lower() == "true"
-        
-        connection_kwargs = {
-            "decode_responses": True,
-        }
-        
-        if ssl:
-            from urllib.parse import urlparse
-            import certifi
-            parsed = urlparse(redis_url)
-            redis_client = redis.Redis(
-                host=parsed.hostname,
-                port=parsed.port,
-                password=parsed.password,
-                decode_responses=True,
-                ssl=True,
-                ssl_ca_certs=certifi.where() if ca_cert_use_certifi else None
-            )
-        else:
-            redis_client = redis.from_url(redis_url, **connection_kwargs)
-    
-    return redis_client
+# Hard cap on /signals/latest; longer reads go through /signals/history
+LATEST_MAX_LIMIT = int(os.getenv("LATEST_MAX_LIMIT", "1000"))
+
+# Newest decoded signals per stream, kept current by the stream hubs. A cache can't
+# be larger than the hub's ring buffer, since the hub primes it from that buffer.
+latest_caches: Dict[str, LatestCache] = {}
+
+# Newest signal per symbol for each stream, mirrored to a Redis hash for cold starts
+symbol_indexes: Dict[str, SymbolIndex] = {}
+
+# Rolling 1m/1h/24h counts per symbol and side for each stream
+signal_stats: Dict[str, SignalStats] = {}
+
+# Paper equity curve, followed from metrics:ticks and exec:paper:confirms
+equity_curve = EquityCurve(get_redis_client)
+
+# Latency percentile sketches, followed from metrics:signals:e2e and metrics:md:lag
+latency_tracker = LatencyTracker(get_redis_client)
+
+# Entries older than the Redis hot window, on disk; None unless ARCHIVE_DIR is set
+archive_store = archive.ArchiveStore() if archive.ARCHIVE_DIR else None
+archiver = archive.Archiver(get_redis_client, archive_store, sorted(SIGNAL_STREAMS)) if archive_store else None
+
+# signals:active → concrete stream, refreshed in the background
+aliases = AliasResolver(get_redis_client)
+
+def resolve_stream(stream: Optional[str]) -> str:
+    """Map a requested stream or alias to a concrete stream key, 400 if unknown"""
+    try:
+        return aliases.resolve(stream)
+    except UnknownStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_stream_hub(stream_key: str) -> hub.StreamHub:
+    """Shared hub for a stream, with its cache and symbol index attached on first use"""
+    stream_hub = hub.get_hub(get_read_client, stream_key, get_blocking_client, xread_slot)
+    if stream_key not in latest_caches:
+        cache = latest_caches[stream_key] = LatestCache(min(CACHE_SIZE, hub.BUFFER_SIZE))
+        stream_hub.add_listener(cache.update)
+        index = symbol_indexes[stream_key] = SymbolIndex(stream_key, get_redis_client)
+        stream_hub.add_listener(index.update)
+        stats = signal_stats[stream_key] = SignalStats(stream_key, get_read_client)
+        stream_hub.add_listener(stats.update)
+        stream_hub.add_listener(metrics.xread_listener(stream_key))
+    return stream_hub
 
 @app.on_event("startup")
 async def startup_event():
     await get_redis_client()
+    try:
+        await aliases.refresh()
+    except Exception as e:
+        print(f"Error resolving stream aliases: {e}")
+    aliases.start()
+    # Prime the default stream now so its symbol index (and `<stream>:latest` hash)
+    # follows every signal from startup, not only once a client first reads it
+    try:
+        await get_stream_hub(aliases.resolve()).ensure_primed()
+    except Exception as e:
+        print(f"Error priming {aliases.resolve()}: {e}")
+    # Replicas serve range reads only while they keep up on the streams being served
+    redis_clients.watch_replicas(lambda: list(latest_caches))
+    # Metric streams ride the hubs' XREAD rather than holding blocking connections of their own
+    reader = hub.get_reader(get_read_client, get_blocking_client, xread_slot)
+    reader.follow(equity_curve.follower)
+    reader.follow(latency_tracker.follower)
+    loop_lag.start()
+    if archiver is not None:
+        archiver.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    global redis_client
-    if redis_client:
-        await redis_client.close()
+    await aliases.stop()
+    await loop_lag.stop()
+    if archiver is not None:
+        await archiver.stop()
+    await hub.stop_all()
+    latest_caches.clear()
+    symbol_indexes.clear()
+    signal_stats.clear()
+    await redis_clients.aclose()
 
 @app.get("/healthz")
 async def health_check():
     try:
         client = await get_redis_client()
         await client.ping()
-        return {"status": "ok", "redis": "up"}
+        return {"status": "ok", "redis": "up", "pools": redis_clients.stats()}
     except Exception as e:
         raise HTTPException(status_code=503, detail={"status": "error", "redis": "down", "error": str(e)})
 
+async def scan_latest(client, stream_key: str, limit: int, signal_filter: SignalFilter) -> List[Signal]:
+    """Walk the stream newest-first until `limit` signals match the filter, oldest-first result."""
+    matched: List[Signal] = []
+    upper = "+"
+    scanned = 0
+    page = max(limit, 100)
+    while len(matched) < limit and scanned < history.SCAN_MAX:
+        entries = await client.xrevrange(stream_key, max=upper, count=page)
+        if not entries:
+            break
+        scanned += len(entries)
+        for entry_id, fields in entries:
+            signal = Signal(entry_id, fields)
+            if signal_filter.matches(signal):
+                matched.append(signal)
+                if len(matched) == limit:
+                    break
+        upper = f"({entries[-1][0]}"
+    matched.reverse()
+    return matched
+
+def signals_etag(
+    stream_key: str, newest_id: Optional[str], limit: int, signal_filter: SignalFilter, fmt: str
+) -> str:
+    """Weak ETag for a /signals/latest response: newest stream ID plus the normalized query"""
+    query = "|".join([
+        stream_key,
+        fmt,
+        str(limit),
+        ",".join(sorted(signal_filter.symbols)),
+        ",".join(sorted(signal_filter.sides)),
+        ",".join(sorted(signal_filter.strategies)),
+    ])
+    digest = hashlib.blake2s(query.encode(), digest_size=8).hexdigest()
+    return f'W/"{newest_id or "0-0"}.{digest}"'
+
+def negotiate_format(request: Request, fmt: Optional[str]) -> str:
+    try:
+        return formats.negotiate_format(fmt, request.headers.get("accept"))
+    except formats.UnsupportedFormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+def signals_response(
+    request: Request, signals: List[Signal], fmt: str, headers: Optional[Dict[str, str]] = None, **extra
+) -> Response:
+    """Serialize signals in the negotiated format, compressed if the client accepts it"""
+    if fmt == formats.NDJSON:
+        body = formats.ndjson_lines(signals)
+    elif fmt == formats.MSGPACK:
+        body = formats.encode_msgpack(signals, **extra)
+    else:
+        body = encode_signals(signals, **extra)
+
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept, Accept-Encoding"
+    encoding = formats.choose_encoding(body, request.headers.get("accept-encoding"))
+    if encoding:
+        body = formats.compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type=formats.MEDIA_TYPES[fmt], headers=headers)
+
+def record_rest_delivery(stream_key: str, signals: List[Signal]) -> None:
+    """Publish→flush lag of the freshest signal a REST response is serving"""
+    if signals:
+        metrics.observe_flush(metrics.flush_lag(stream_key, "rest"), max(signals, key=lambda s: s.published_ms))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored on both sides
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus exposition of request, Redis, SSE and event-loop metrics"""
+    return Response(**metrics.render())
+
 @app.get("/signals/latest")
-async def get_latest_signals(limit: int = 50):
+async def get_latest_signals(
+    request: Request,
+    limit: int = 50,
+    symbol: Optional[str] = None,
+    side: Optional[str] = None,
+    strategy: Optional[str] = None,
+    stream: Optional[str] = None,
+    fmt: Optional[str] = Query(None, alias="format"),
+):
+    stream_key = resolve_stream(stream)
+    fmt = negotiate_format(request, fmt)
+    limit = max(0, min(limit, LATEST_MAX_LIMIT))
     try:
-        client = await get_redis_client()
-        stream_key = os.getenv("REDIS_STREAM_KEY", "signals:live")
-        
-        # Get the latest entries from the stream
-        entries = await client.xrevrange(stream_key, count=limit)
-        
-        # Convert to list of dictionaries and reverse to get oldest-first
-        signals = []
-        for entry_id, fields in reversed(entries):
-            signal = {
-                "id": entry_id,
-                "symbol": fields.get("symbol", ""),
-                "side": fields.get("side", ""),
-                "price": fields.get("price", ""),
-                "timestamp": entry_id.split("-")[0]  # Extract timestamp from stream ID
-            }
-            signals.append(signal)
+        signal_filter = SignalFilter.from_params(symbol, side, strategy)
+        # Priming is a one-off XREVRANGE; after that the shared reader keeps the cache current
+        await get_stream_hub(stream_key).ensure_primed()
+        cache = latest_caches[stream_key]
+
+        # The response only changes when a new entry arrives, so the newest ID validates it
+        headers = {
+            "ETag": signals_etag(stream_key, cache.newest_id, limit, signal_filter, fmt),
+            "Cache-Control": cache_control(stream_key),
+        }
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        signals = cache.get(limit, signal_filter)
+        if signals is None:
+            client = await get_read_client()
+            
+            if signal_filter.is_empty:
+                # Get the latest entries from the stream
+                entries = await client.xrevrange(stream_key, count=limit)
+                
+                # Encode each entry and reverse to get oldest-first
+                signals = [Signal(entry_id, fields) for entry_id, fields in reversed(entries)]
+            else:
+                signals = await scan_latest(client, stream_key, limit, signal_filter)
         
-        return {"signals": signals, "count": len(signals)}
+        record_rest_delivery(stream_key, signals)
+        return signals_response(request, signals, fmt, headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching signals: {str(e)}")
 
+def ndjson_export(request: Request, scan: "history.RangeScan") -> StreamingResponse:
+    """Stream a range scan as NDJSON, one XRANGE chunk at a time"""
+    async def lines():
+        try:
+            async for batch in scan.chunks():
+                yield formats.ndjson_lines(batch)
+            if scan.next_cursor:
+                yield orjson.dumps({"next_cursor": scan.next_cursor}) + b"\n"
+        except Exception as e:
+            print(f"Error exporting {scan.stream_key}: {e}")
+            yield orjson.dumps({"error": str(e)}) + b"\n"
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = formats.negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(
+        formats.compress_stream(lines(), encoding),
+        media_type=formats.MEDIA_TYPES[formats.NDJSON],
+        headers=headers,
+    )
+
+@app.get("/signals/history")
+async def get_signal_history(
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    symbol: Optional[str] = None,
+    side: Optional[str] = None,
+    strategy: Optional[str] = None,
+    stream: Optional[str] = None,
+    fmt: Optional[str] = Query(None, alias="format"),
+):
+    """Page through a stream oldest-first; start/end are stream IDs or epoch ms
+
+    format=ndjson streams up to HISTORY_MAX_EXPORT signals as they are read, one per
+    line, followed by a {"next_cursor": ...} line when more remain.
+    """
+    stream_key = resolve_stream(stream)
+    fmt = negotiate_format(request, fmt)
+    try:
+        if cursor:
+            range_start, range_end = history.decode_cursor(cursor, stream_key)
+        else:
+            range_start = history.parse_bound(start, "-")
+            range_end = history.parse_bound(end, "+")
+    except history.InvalidRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        client = await get_read_client()
+        signal_filter = SignalFilter.from_params(symbol, side, strategy)
+        if fmt == formats.NDJSON:
+            scan = history.RangeScan(
+                client, stream_key, range_start, range_end, limit, signal_filter,
+                max_limit=history.MAX_EXPORT_SIZE, archive=archive_store,
+            )
+            return ndjson_export(request, scan)
+
+        signals, next_cursor = await history.read_page(
+            client, stream_key, range_start, range_end, limit, signal_filter, archive=archive_store
+        )
+        return signals_response(request, signals, fmt, next_cursor=next_cursor)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching signal history: {str(e)}")
+
+@app.get("/signals/by-symbol")
+async def get_signals_by_symbol(
+    request: Request,
+    symbol: Optional[str] = None,
+    stream: Optional[str] = None,
+    fmt: Optional[str] = Query(None, alias="format"),
+):
+    """Current signal for each pair (or the requested ones), sorted by symbol"""
+    stream_key = resolve_stream(stream)
+    fmt = negotiate_format(request, fmt)
+    try:
+        stream_hub = get_stream_hub(stream_key)
+        index = symbol_indexes[stream_key]
+        # Persisted pairs first, then the ring buffer's newer entries on top
+        await index.ensure_loaded()
+        await stream_hub.ensure_primed()
+        signals = index.get(SignalFilter.from_params(symbol).symbols)
+        record_rest_delivery(stream_key, signals)
+        return signals_response(request, signals, fmt, headers={"Cache-Control": cache_control(stream_key)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching signals by symbol: {str(e)}")
+
+@app.get("/signals/stats")
+async def get_signals_stats(symbol: Optional[str] = None, stream: Optional[str] = None):
+    """Signal counts, buy/sell ratio and price range per symbol and side over 1m/1h/24h"""
+    stream_key = resolve_stream(stream)
+    try:
+        stream_hub = get_stream_hub(stream_key)
+        await stream_hub.ensure_primed()
+        stats = signal_stats[stream_key]
+        await stats.ensure_backfilled(stream_hub.last_id)
+        windows = stats.snapshot(SignalFilter.from_params(symbol).symbols)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing signal stats: {str(e)}")
+    return Response(
+        content=orjson.dumps({"stream": stream_key, "windows": windows}),
+        media_type="application/json",
+        headers={"Cache-Control": cache_control(stream_key)},
+    )
+
+@app.get("/data/backtest-pnl")
+async def get_backtest_pnl(n: int = 500):
+    """Paper equity curve downsampled (LTTB) to at most n points"""
+    n = max(2, min(n, PNL_MAX_POINTS))
+    if not equity_curve.loaded:
+        raise HTTPException(status_code=503, detail="Equity curve is still loading")
+    return Response(content=equity_curve.render(n), media_type="application/json")
+
+@app.get("/slo/latency")
+async def get_slo_latency(window: Optional[str] = None):
+    """p50/p95/p99 end-to-end and market-data lag per agent and stream, from sketches"""
+    windows = tuple(LATENCY_WINDOWS) if window is None else tuple(w.strip() for w in window.split(","))
+    unknown = [w for w in windows if w not in LATENCY_WINDOWS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown window {unknown[0]!r}; expected one of {list(LATENCY_WINDOWS)}")
+    if not latency_tracker.loaded:
+        raise HTTPException(status_code=503, detail="Latency sketches are still loading")
+    return Response(
+        content=orjson.dumps({"samples": latency_tracker.samples, "metrics": latency_tracker.summary(windows)}),
+        media_type="application/json",
+    )
+
+@app.get("/signals/cache")
+async def get_signals_cache_stats():
+    """Hit/miss counters for the /signals/latest cache of each stream"""
+    return {stream_key: cache.stats() for stream_key, cache in latest_caches.items()}
+
 @app.get("/sse/signals")
-async def stream_signals():
+async def stream_signals(
+    request: Request,
+    symbol: Optional[str] = None,
+    side: Optional[str] = None,
+    strategy: Optional[str] = None,
+    stream: Optional[str] = None,
+    delivery_ts: bool = False,
+):
+    # Browsers send Last-Event-ID automatically when EventSource reconnects
+    last_event_id = request.headers.get("last-event-id")
+    signal_filter = SignalFilter.from_params(symbol, side, strategy)
+    stream_key = resolve_stream(stream)
+    flush_lag = metrics.flush_lag(stream_key, "sse")
+
     async def event_generator():
+        # One shared XREAD for all streams; this client only drains its own queue
+        stream_hub = get_stream_hub(stream_key)
+        subscriber = None
         try:
-            client = await get_redis_client()
-            stream_key = os.getenv("REDIS_STREAM_KEY", "signals:live")
-            
-            # Start from the latest entry
-            last_id = "$"
-            
+            subscriber, missed, gap = await stream_hub.subscribe(last_event_id, signal_filter)
+            if gap is not None:
+                # Too far behind to replay: tell the client which range to backfill from history
+                yield "event: gap\n"
+                yield f"data: {orjson.dumps({'after': gap[0], 'before': gap[1]}).decode()}\n\n"
+            # Replay first; live signals queue up behind it under the slow-consumer policy
+            for signal in missed:
+                yield signal.frame
             while True:
-                try:
-                    # Read from stream with blocking
-                    messages = await client.xread({stream_key: last_id}, block=1000)
-                    
-                    for stream, entries in messages:
-                        for entry_id, fields in entries:
-                            signal = {
-                                "id": entry_id,
-                                "symbol": fields.get("symbol", ""),
-                                "side": fields.get("side", ""),
-                                "price": fields.get("price", ""),
-                                "timestamp": entry_id.split("-")[0]
-                            }
-                            
-                            # Send SSE event
-                            yield f"event: signal\n"
-                            yield f"data: {orjson.dumps(signal).decode()}\n\n"
-                            
-                            last_id = entry_id
-                            
-                except Exception as e:
-                    print(f"Error in stream: {e}")
-                    await asyncio.sleep(1)
-                    
+                signal = await subscriber.get()
+                if delivery_ts:
+                    # Opt-in, so only these clients pay for a per-client frame
+                    yield signal.frame_with_delivery(int(time.time() * 1000))
+                else:
+                    # Pre-encoded frame; the stream ID doubles as the SSE event ID for resume
+                    yield signal.frame
+                # Resumed once the frame has been handed to the server for writing
+                metrics.observe_flush(flush_lag, signal)
+                
+        except SlowConsumerError:
+            # Closed for not draining: writing more would only wait on that same client.
+            # Ending the stream drops it; it resumes via Last-Event-ID
+            return
         except Exception as e:
             print(f"Error in event generator: {e}")
-            yield f"event: error\n"
+            yield "event: error\n"
             yield f"data: {orjson.dumps({'error': str(e)}).decode()}\n\n"
+        finally:
+            if subscriber is not None:
+                stream_hub.unsubscribe(subscriber)
     
     return StreamingResponse(
         event_generator(),
@@ -144,6 +452,18 @@ async def stream_signals():
         }
     )
 
+@app.get("/sse/subscribers")
+async def get_sse_subscribers(stream: Optional[str] = None):
+    """Per-connection lag and dropped-signal counters for SSE clients"""
+    stream_key = resolve_stream(stream)
+    subscribers = get_stream_hub(stream_key).subscriber_stats()
+    return {
+        "stream": stream_key,
+        "count": len(subscribers),
+        "dropped": sum(s["dropped"] for s in subscribers),
+        "subscribers": subscribers,
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
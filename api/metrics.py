@@ -0,0 +1,172 @@
+"""
+Prometheus instrumentation for the API, exposed on /metrics.
+
+Recording is kept cheap enough to leave on in production: labels are bounded
+(route templates rather than raw paths, status classes, Redis command names,
+allowlisted stream keys), and per-subscriber SSE counters are read from the
+hubs at scrape time instead of being updated on every frame.
+
+Delivery lag is measured from the publish time in each stream ID: publish→read
+when the hub reader receives an entry, publish→flush when an SSE frame is
+handed to the server or a REST response serves it.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+import hub
+from background import BackgroundService
+from signals import Signal
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+# Any other request method is counted as "other", so clients can't mint label values
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "CONNECT", "TRACE"))
+
+REQUESTS = Counter(
+    "signals_api_requests_total", "HTTP requests by route template, method and status class",
+    ["route", "method", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "signals_api_request_duration_seconds", "Time to response headers by route template", ["route"],
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "signals_api_redis_command_duration_seconds", "Redis round-trip time by command (XREAD includes BLOCK)",
+    ["command"],
+)
+XREAD_BATCH = Histogram(
+    "signals_api_xread_batch_entries", "Entries per stream in each XREAD the hub reader receives", ["stream"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+DELIVERY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+READ_LAG_SECONDS = Histogram(
+    "signals_api_publish_to_read_seconds", "Stream-ID publish time to the hub reader receiving the entry",
+    ["stream"], buckets=DELIVERY_BUCKETS,
+)
+FLUSH_LAG_SECONDS = Histogram(
+    "signals_api_publish_to_flush_seconds",
+    "Stream-ID publish time to the entry being written to a client (REST: newest entry in the body)",
+    ["stream", "transport"], buckets=DELIVERY_BUCKETS,
+)
+LOOP_LAG_SECONDS = Histogram(
+    "signals_api_event_loop_lag_seconds", "How late the event loop runs a scheduled wakeup",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them to response headers.
+
+    Timing stops at http.response.start so SSE connections are measured by
+    their time to first byte, not by how long the client stays connected.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                REQUEST_SECONDS.labels(_route(scope)).observe(time.perf_counter() - start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS.labels(_route(scope), _method(scope), f"{status[0] // 100}xx").inc()
+
+
+def _method(scope) -> str:
+    method = scope["method"]
+    return method if method in HTTP_METHODS else "other"
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def observe_redis_command(command: str, seconds: float) -> None:
+    REDIS_COMMAND_SECONDS.labels(command).observe(seconds)
+
+
+def xread_listener(stream_key: str):
+    """Hub listener recording each dispatched batch's size and publish→read lag."""
+    batch_sizes = XREAD_BATCH.labels(stream_key)
+    read_lag = READ_LAG_SECONDS.labels(stream_key)
+
+    def observe(signals: List[Signal], reset: bool = False) -> None:
+        # The priming snapshot is history, not delivery
+        if reset or not signals:
+            return
+        batch_sizes.observe(len(signals))
+        now_ms = time.time() * 1000
+        for signal in signals:
+            read_lag.observe(max(0.0, now_ms - signal.published_ms) / 1000)
+
+    return observe
+
+
+def flush_lag(stream_key: str, transport: str):
+    """Histogram child for publish→flush lag; bind once per connection or request."""
+    return FLUSH_LAG_SECONDS.labels(stream_key, transport)
+
+
+def observe_flush(histogram, signal: Signal, now_ms: Optional[float] = None) -> None:
+    now_ms = time.time() * 1000 if now_ms is None else now_ms
+    histogram.observe(max(0.0, now_ms - signal.published_ms) / 1000)
+
+
+class HubCollector:
+    """Reads SSE subscriber counts and frame totals from the hubs at scrape time."""
+
+    def collect(self) -> Iterable[Any]:
+        subscribers = GaugeMetricFamily("signals_api_sse_subscribers", "Connected SSE clients", labels=["stream"])
+        sent = CounterMetricFamily("signals_api_sse_frames_sent", "SSE signal frames written", labels=["stream"])
+        dropped = CounterMetricFamily(
+            "signals_api_sse_frames_dropped", "Signals dropped by the slow-consumer policy", labels=["stream"]
+        )
+        for stream_key, stream_hub in hub.hubs().items():
+            frames_sent, frames_dropped = stream_hub.delivery_totals()
+            subscribers.add_metric([stream_key], stream_hub.subscriber_count)
+            sent.add_metric([stream_key], frames_sent)
+            dropped.add_metric([stream_key], frames_dropped)
+        yield subscribers
+        yield sent
+        yield dropped
+
+
+REGISTRY.register(HubCollector())
+
+
+class LoopLagMonitor(BackgroundService):
+    """Sleeps a fixed interval and records how late each wakeup is."""
+
+    task_name = "metrics:loop-lag"
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self._interval = interval
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+
+
+def render() -> Dict[str, Any]:
+    """Body and content type for the /metrics response."""
+    return {"content": generate_latest(REGISTRY), "media_type": CONTENT_TYPE_LATEST}
@@ -0,0 +1,190 @@
+"""
+Paper-trading equity curve for /data/backtest-pnl.
+
+A StreamFollower on the shared hub reader follows `metrics:ticks` (PnL
+snapshots) and `exec:paper:confirms` (fills) and appends to growable NumPy
+arrays, so the curve is maintained incrementally instead of rebuilt per
+request. Responses are downsampled with Largest-Triangle-Three-Buckets to the
+requested point count and cached per resolution.
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from hub import StreamFollower
+
+logger = logging.getLogger(__name__)
+
+TICKS_STREAM = os.getenv("PNL_TICKS_STREAM", "metrics:ticks")
+CONFIRMS_STREAM = os.getenv("PNL_CONFIRMS_STREAM", "exec:paper:confirms")
+INITIAL_EQUITY = float(os.getenv("PNL_INITIAL_EQUITY", "10000"))
+# A cached resolution is reused until the curve changes, or for this long while it keeps changing
+CACHE_TTL_SECONDS = float(os.getenv("PNL_CACHE_TTL", "5"))
+CACHE_RESOLUTIONS = 32
+MAX_POINTS = int(os.getenv("PNL_MAX_POINTS", "5000"))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of (x, y)."""
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out <= 2:
+        # Too few points for a middle bucket: keep the endpoints
+        return np.array([0, n - 1][:max(n_out, 1)], dtype=np.int64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Third vertex: the average of the next bucket (or the last point)
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx = x[nxt_lo:nxt_hi].mean() if nxt_hi > nxt_lo else x[-1]
+        cy = y[nxt_lo:nxt_hi].mean() if nxt_hi > nxt_lo else y[-1]
+        bx, by = x[lo:hi], y[lo:hi]
+        areas = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(areas.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+class _Series:
+    """Append-only float64 columns that double their capacity when full."""
+
+    def __init__(self, columns: int, capacity: int = 1024):
+        self._data = np.empty((capacity, columns), dtype=np.float64)
+        self.size = 0
+
+    def append(self, *row: float) -> None:
+        if self.size == len(self._data):
+            grown = np.empty((len(self._data) * 2, self._data.shape[1]), dtype=np.float64)
+            grown[: self.size] = self._data
+            self._data = grown
+        self._data[self.size] = row
+        self.size += 1
+
+    def column(self, i: int) -> np.ndarray:
+        return self._data[: self.size, i]
+
+
+def _tick_pnl(fields: Dict[str, str]) -> Optional[Tuple[float, float]]:
+    """(timestamp in seconds, equity) from a metrics.tick entry, or None if it has no PnL."""
+    payload: Any = fields
+    # Publishers either flatten the tick or put the JSON document in one field
+    for key in ("json", "data", "payload"):
+        if key in fields:
+            try:
+                payload = orjson.loads(fields[key])
+            except ValueError:
+                return None
+            break
+    # A document field can hold any JSON value; only an object can carry a tick
+    if not isinstance(payload, dict):
+        return None
+    pnl = payload.get("pnl")
+    if isinstance(pnl, str):
+        try:
+            pnl = orjson.loads(pnl)
+        except ValueError:
+            return None
+    if not isinstance(pnl, dict):
+        pnl = None
+    try:
+        if "equity" in payload:
+            equity = float(payload["equity"])
+        elif pnl is not None:
+            # Fees are reported separately from realized PnL
+            equity = INITIAL_EQUITY + float(pnl.get("realized", 0)) + float(pnl.get("unrealized", 0)) - float(pnl.get("fees", 0))
+        else:
+            return None
+        ts = float(payload.get("timestamp") or 0)
+    except (TypeError, ValueError):
+        return None
+    return ts, equity
+
+
+class EquityCurve:
+    """Follows the tick and confirm streams and serves the equity curve at any resolution."""
+
+    def __init__(self, get_client: Callable[[], Awaitable]):
+        # Columns: ts (s), equity, pnl since the start of that UTC day
+        self._points = _Series(3)
+        self._day: Optional[int] = None
+        self._day_open = INITIAL_EQUITY
+        self.fills = 0
+        self._cache: "OrderedDict[int, Tuple[int, float, bytes]]" = OrderedDict()
+        # Both streams from the start; registered with the hub reader at startup
+        self.follower = StreamFollower(get_client, (TICKS_STREAM, CONFIRMS_STREAM), self._apply_batch)
+
+    @property
+    def loaded(self) -> bool:
+        return self.follower.loaded
+
+    def _apply_batch(self, stream: str, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        for entry_id, fields in entries:
+            self._apply(stream, entry_id, fields)
+
+    def _apply(self, stream: str, entry_id: str, fields: Dict[str, str]) -> None:
+        if stream == CONFIRMS_STREAM:
+            if fields.get("status", "filled") == "filled":
+                self.fills += 1
+            return
+        tick = _tick_pnl(fields)
+        if tick is None:
+            return
+        ts, equity = tick
+        if ts <= 0:
+            ts = int(entry_id.split("-")[0]) / 1000
+        elif ts > 1e11:
+            ts /= 1000  # epoch milliseconds
+        day = int(ts // 86400)
+        if day != self._day:
+            # Equity carried over from the previous point opens the new day
+            if self._points.size:
+                self._day_open = float(self._points.column(1)[-1])
+            self._day = day
+        self._points.append(ts, equity, equity - self._day_open)
+
+    def render(self, n: int) -> bytes:
+        """JSON body with at most n points, reusing the cached rendering for n when fresh."""
+        cached = self._cache.get(n)
+        now = time.monotonic()
+        if cached is not None and (cached[0] == self._points.size or now - cached[1] < CACHE_TTL_SECONDS):
+            self._cache.move_to_end(n)
+            return cached[2]
+
+        ts, equity, daily = (self._points.column(i) for i in range(3))
+        keep = lttb(ts, equity, n)
+        data = [
+            {"ts": int(t), "equity": round(float(e), 2), "daily_pnl": round(float(d), 2)}
+            for t, e, d in zip(ts[keep], equity[keep], daily[keep])
+        ]
+        metadata = {
+            "source": f"{TICKS_STREAM}, {CONFIRMS_STREAM}",
+            "initial_equity": INITIAL_EQUITY,
+            "final_equity": round(float(equity[-1]), 2) if len(equity) else INITIAL_EQUITY,
+            "max_drawdown_pct": _max_drawdown_pct(equity),
+            "fills": self.fills,
+            "source_points": int(self._points.size),
+            "data_points": len(data),
+        }
+        body = orjson.dumps({"metadata": metadata, "data": data})
+        self._cache[n] = (self._points.size, now, body)
+        self._cache.move_to_end(n)
+        while len(self._cache) > CACHE_RESOLUTIONS:
+            self._cache.popitem(last=False)
+        return body
+
+
+def _max_drawdown_pct(equity: np.ndarray) -> float:
+    if not len(equity):
+        return 0.0
+    peaks = np.maximum.accumulate(equity)
+    drawdowns = np.where(peaks > 0, (equity - peaks) / peaks, 0.0)
+    return round(float(drawdowns.min()) * 100, 2)
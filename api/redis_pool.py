@@ -0,0 +1,350 @@
+"""
+Shared Redis client factory for the API, the Discord bot and the scripts.
+
+Two explicitly sized connection pools are kept per process: one for short
+request/response commands (PING, XREVRANGE, XRANGE, ...) and one reserved for
+blocking XREADs, so a blocking reader can never starve /healthz or
+/signals/latest of connections. Both pools use TCP keepalive, periodic health
+checks, socket timeouts and retries with decorrelated jitter backoff.
+
+Environment:
+    REDIS_URL                   redis:// or rediss:// URL (default redis://localhost:6379)
+    REDIS_SSL                   "true" forces TLS even for a redis:// URL
+    REDIS_CA_CERT_USE_CERTIFI   "true" verifies TLS against certifi's CA bundle
+    REDIS_POOL_SIZE             request/response pool size (default 20)
+    REDIS_BLOCKING_POOL_SIZE    blocking-read pool size (default 4)
+    REDIS_REPLICA_URLS          comma-separated read replica URLs (optional)
+    REDIS_REPLICA_MAX_LAG       entries a replica may trail the primary by (default 10)
+    REDIS_CLUSTER               "true" to connect to a Redis Cluster at REDIS_URL
+
+Range reads (XREVRANGE/XRANGE/XLEN) go through get_read_client(). With
+replicas configured, it round-robins over the replicas that are reachable
+and no more than REDIS_REPLICA_MAX_LAG entries behind the primary on every
+watched stream, and falls back to the primary otherwise. To try it locally:
+
+    redis-server --port 6380 --replicaof 127.0.0.1 6379
+    REDIS_REPLICA_URLS=redis://127.0.0.1:6380 python scripts/test_replica_routing.py
+
+In cluster mode reads are spread over replicas by the cluster client itself.
+A multi-key command must stay within one hash slot, so the hub reader sends
+one XREAD per slot (see xread_slot). Streams that share a hash tag (e.g.
+`{signals}:live`, `{signals}:paper`) share a blocking read.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import redis.asyncio as redis
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.connection import SSLConnection
+from redis.asyncio.retry import Retry
+from redis.crc import key_slot
+from redis.backoff import DecorrelatedJitterBackoff
+from redis.exceptions import ConnectionError, TimeoutError
+
+from background import BackgroundService
+
+POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "20"))
+BLOCKING_POOL_SIZE = int(os.getenv("REDIS_BLOCKING_POOL_SIZE", "4"))
+# Seconds a command waits for a free pooled connection before failing
+POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+# Must comfortably exceed the XREAD block time (1s)
+BLOCKING_SOCKET_TIMEOUT = float(os.getenv("REDIS_BLOCKING_SOCKET_TIMEOUT", "10"))
+CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "5"))
+HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+RETRY_ATTEMPTS = int(os.getenv("REDIS_RETRY_ATTEMPTS", "3"))
+RETRY_BACKOFF_BASE = float(os.getenv("REDIS_RETRY_BACKOFF_BASE", "0.05"))
+RETRY_BACKOFF_CAP = float(os.getenv("REDIS_RETRY_BACKOFF_CAP", "2"))
+
+REPLICA_URLS = [url.strip() for url in os.getenv("REDIS_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG = int(os.getenv("REDIS_REPLICA_MAX_LAG", "10"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REDIS_REPLICA_CHECK_INTERVAL", "2"))
+CLUSTER = os.getenv("REDIS_CLUSTER", "false").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "false").lower() == "true"
+
+
+def create_pool(
+    max_connections: int = POOL_SIZE,
+    socket_timeout: float = SOCKET_TIMEOUT,
+    redis_url: Optional[str] = None,
+    ssl: Optional[bool] = None,
+    use_certifi: Optional[bool] = None,
+) -> redis.BlockingConnectionPool:
+    """Build a bounded connection pool from REDIS_URL and the TLS settings."""
+    redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+    ssl = _env_flag("REDIS_SSL") if ssl is None else ssl
+    use_certifi = _env_flag("REDIS_CA_CERT_USE_CERTIFI") if use_certifi is None else use_certifi
+
+    kwargs: Dict[str, Any] = {
+        "decode_responses": True,
+        "max_connections": max_connections,
+        "timeout": POOL_TIMEOUT,
+        "socket_timeout": socket_timeout,
+        "socket_connect_timeout": CONNECT_TIMEOUT,
+        "socket_keepalive": True,
+        "health_check_interval": HEALTH_CHECK_INTERVAL,
+        "retry": Retry(DecorrelatedJitterBackoff(cap=RETRY_BACKOFF_CAP, base=RETRY_BACKOFF_BASE), RETRY_ATTEMPTS),
+        "retry_on_error": [ConnectionError, TimeoutError],
+    }
+    if ssl or redis_url.startswith("rediss://"):
+        kwargs["connection_class"] = SSLConnection
+        if use_certifi:
+            import certifi
+            kwargs["ssl_ca_certs"] = certifi.where()
+    return redis.BlockingConnectionPool.from_url(redis_url, **kwargs)
+
+
+# Check-then-act on a lease must be one step, or the lease can lapse and pass to
+# another holder between the GET and the write
+_RENEW_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+async def renew_lease(client, key: str, token: str, lease_ms: int) -> bool:
+    """Extend a lease to lease_ms if `token` still holds it."""
+    return bool(await client.eval(_RENEW_LEASE, 1, key, token, lease_ms))
+
+
+async def release_lease(client, key: str, token: str) -> bool:
+    """Delete a lease if `token` still holds it."""
+    return bool(await client.eval(_RELEASE_LEASE, 1, key, token))
+
+
+class TimedRedis(redis.Redis):
+    """Client that reports each command's name and round-trip time to `observer` when set."""
+
+    observer: Optional[Callable[[str, float], None]] = None
+
+    async def execute_command(self, *args, **options):
+        observer = TimedRedis.observer
+        if observer is None:
+            return await super().execute_command(*args, **options)
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            observer(str(args[0]).upper(), time.perf_counter() - start)
+
+
+def create_client(**pool_kwargs) -> redis.Redis:
+    """Standalone client with its own pool, for scripts; closing it closes the pool."""
+    return redis.Redis.from_pool(create_pool(**pool_kwargs))
+
+
+def pool_stats(pool: redis.ConnectionPool) -> Dict[str, int]:
+    return {
+        "max": pool.max_connections,
+        "in_use": len(pool._in_use_connections),
+        "idle": len(pool._available_connections),
+    }
+
+
+def create_cluster_client() -> RedisCluster:
+    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+    kwargs: Dict[str, Any] = {
+        "decode_responses": True,
+        "read_from_replicas": True,
+        "socket_timeout": BLOCKING_SOCKET_TIMEOUT,
+        "socket_connect_timeout": CONNECT_TIMEOUT,
+        "socket_keepalive": True,
+        "health_check_interval": HEALTH_CHECK_INTERVAL,
+        "max_connections": POOL_SIZE + BLOCKING_POOL_SIZE,
+    }
+    if _env_flag("REDIS_SSL"):
+        kwargs["ssl"] = True
+        if _env_flag("REDIS_CA_CERT_USE_CERTIFI"):
+            import certifi
+            kwargs["ssl_ca_certs"] = certifi.where()
+    return RedisCluster.from_url(redis_url, **kwargs)
+
+
+def xread_slot(stream_key: str) -> Optional[int]:
+    """Hash slot that confines an XREAD of this stream in cluster mode; None otherwise."""
+    return key_slot(stream_key.encode()) if CLUSTER else None
+
+
+async def replica_lag(primary: redis.Redis, replica: redis.Redis, stream_key: str, max_lag: int) -> int:
+    """Entries of a stream the replica is missing, counted up to max_lag + 1."""
+    newest = await replica.xrevrange(stream_key, count=1)
+    after = f"({newest[0][0]}" if newest else "-"
+    missing = await primary.xrange(stream_key, min=after, max="+", count=max_lag + 1)
+    return len(missing)
+
+
+class ReplicaRouter(BackgroundService):
+    """Routes range reads to in-sync replicas, falling back to the primary."""
+
+    task_name = "redis:replicas"
+
+    def __init__(
+        self,
+        get_primary: Callable[[], Any],
+        urls: List[str],
+        max_lag: int = REPLICA_MAX_LAG,
+        interval: float = REPLICA_CHECK_INTERVAL,
+    ):
+        self._get_primary = get_primary
+        self._replicas = {url: TimedRedis.from_pool(create_pool(redis_url=url)) for url in urls}
+        self._healthy: List[str] = []
+        self._lag: Dict[str, Optional[int]] = {url: None for url in urls}
+        self._rotation = itertools.cycle([])
+        self._max_lag = max_lag
+        self._interval = interval
+        self._streams: Callable[[], Iterable[str]] = lambda: ()
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    async def get(self) -> redis.Redis:
+        if self._healthy:
+            self.replica_reads += 1
+            return self._replicas[next(self._rotation)]
+        self.primary_reads += 1
+        return await self._get_primary()
+
+    async def check(self) -> None:
+        primary = await self._get_primary()
+        streams = list(self._streams())
+        healthy = []
+        for url, replica in self._replicas.items():
+            try:
+                lag = 0
+                for stream_key in streams:
+                    lag = max(lag, await replica_lag(primary, replica, stream_key, self._max_lag))
+                if not streams:
+                    await replica.ping()
+                self._lag[url] = lag
+                if lag <= self._max_lag:
+                    healthy.append(url)
+            except Exception as e:
+                self._lag[url] = None
+                logger.warning(f"Replica {url} unavailable: {e}")
+        if healthy != self._healthy:
+            logger.info(f"Routing reads to {len(healthy)}/{len(self._replicas)} replicas")
+            self._healthy = healthy
+            self._rotation = itertools.cycle(healthy)
+
+    def start(self, streams: Callable[[], Iterable[str]]) -> None:
+        """Start checking replica lag on the streams returned by `streams`."""
+        self._streams = streams
+        super().start()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error checking replicas: {e}")
+            await asyncio.sleep(self._interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": list(self._healthy),
+            "lag": dict(self._lag),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+    async def aclose(self) -> None:
+        await self.stop()
+        for replica in self._replicas.values():
+            await replica.aclose()
+
+
+class RedisClients:
+    """The process-wide request/response, blocking-read and range-read clients."""
+
+    def __init__(self):
+        self._client: Optional[redis.Redis] = None
+        self._blocking_client: Optional[redis.Redis] = None
+        self.replicas: Optional[ReplicaRouter] = None
+
+    async def get(self) -> redis.Redis:
+        if self._client is None:
+            self._client = create_cluster_client() if CLUSTER else TimedRedis.from_pool(create_pool())
+        return self._client
+
+    async def get_blocking(self) -> redis.Redis:
+        """Client for XREAD with BLOCK; never shares connections with get()."""
+        if CLUSTER:
+            # The cluster client manages its own per-node pools
+            return await self.get()
+        if self._blocking_client is None:
+            self._blocking_client = TimedRedis.from_pool(
+                create_pool(BLOCKING_POOL_SIZE, socket_timeout=BLOCKING_SOCKET_TIMEOUT)
+            )
+        return self._blocking_client
+
+    async def get_read(self) -> redis.Redis:
+        """Client for XREVRANGE/XRANGE/XLEN: an in-sync replica when configured, else the primary."""
+        if CLUSTER or not REPLICA_URLS:
+            return await self.get()
+        if self.replicas is None:
+            self.replicas = ReplicaRouter(self.get, REPLICA_URLS)
+        return await self.replicas.get()
+
+    def watch_replicas(self, streams: Callable[[], Iterable[str]]) -> None:
+        """Start replica lag checks on the given streams; a no-op without replicas."""
+        if CLUSTER or not REPLICA_URLS:
+            return
+        if self.replicas is None:
+            self.replicas = ReplicaRouter(self.get, REPLICA_URLS)
+        self.replicas.start(streams)
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {}
+        if CLUSTER:
+            stats["cluster"] = True
+            return stats
+        if self._client is not None:
+            stats["requests"] = pool_stats(self._client.connection_pool)
+        if self._blocking_client is not None:
+            stats["blocking"] = pool_stats(self._blocking_client.connection_pool)
+        if self.replicas is not None:
+            stats["replicas"] = self.replicas.stats()
+        return stats
+
+    async def aclose(self) -> None:
+        if self.replicas is not None:
+            await self.replicas.aclose()
+            self.replicas = None
+        for client in (self._client, self._blocking_client):
+            if client is not None:
+                await client.aclose()
+        self._client = None
+        self._blocking_client = None
+
+
+clients = RedisClients()
+
+
+async def get_redis_client() -> redis.Redis:
+    return await clients.get()
+
+
+async def get_blocking_client() -> redis.Redis:
+    return await clients.get_blocking()
+
+
+async def get_read_client() -> redis.Redis:
+    return await clients.get_read()
@@ -0,0 +1,247 @@
+"""
+Sharded bot mode: shard ranges spread over processes, coordinated in Redis.
+
+With BOT_SHARDED=true the bot runs as an AutoShardedBot. Each process claims
+one of BOT_SHARD_PROCESSES slots under a Redis lease and connects only the
+shards whose ID modulo the slot count equals its slot, so processes can run
+on separate cores or hosts with identical configuration. A process that finds
+every slot taken waits as a standby and takes over a slot whose lease lapses.
+
+One process at a time also holds the leader lease and runs shared background
+work (the signal broadcaster), so signals are posted once no matter how many
+processes run. IDENTIFYs are serialized across processes through Redis to
+respect Discord's one-per-5-seconds limit, and every process publishes per
+shard latency and guild counts for !status to aggregate.
+
+Keys (all under bot:shards):
+    :count          shard count all processes agree on; the first process sets it
+    :slot:<n>       lease of the process owning slot n
+    :leader         lease of the process running shared work
+    :identify       held for IDENTIFY_INTERVAL after each IDENTIFY
+    :stats          hash of shard ID -> JSON latency/guild/member counts
+
+Environment:
+    BOT_SHARDED             run sharded (default false)
+    BOT_SHARD_COUNT         total shards; 0 uses Discord's recommendation (default 0)
+    BOT_SHARD_PROCESSES     processes sharing the shards (default 1)
+    BOT_SHARD_LEASE         seconds a slot or leader lease lasts without renewal (default 30)
+"""
+import asyncio
+import logging
+import math
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from discord.ext import commands
+
+from background import BackgroundService
+from redis_pool import release_lease, renew_lease
+
+logger = logging.getLogger(__name__)
+
+SHARDED = os.getenv("BOT_SHARDED", "false").lower() == "true"
+SHARD_COUNT = int(os.getenv("BOT_SHARD_COUNT", "0"))
+SHARD_PROCESSES = int(os.getenv("BOT_SHARD_PROCESSES", "1"))
+LEASE_SECONDS = float(os.getenv("BOT_SHARD_LEASE", "30"))
+
+KEY_PREFIX = "bot:shards"
+# Discord allows one IDENTIFY per 5 seconds per bot (max_concurrency 1)
+IDENTIFY_INTERVAL = 5.5
+
+
+def shards_for_slot(slot: int, slots: int, shard_count: int) -> List[int]:
+    """Shard IDs owned by a process slot."""
+    return [shard_id for shard_id in range(shard_count) if shard_id % slots == slot]
+
+
+class ShardCoordinator(BackgroundService):
+    """Slot and leader leases for one bot process, plus its published shard stats."""
+
+    def __init__(
+        self,
+        bot,
+        get_client: Callable[[], Awaitable],
+        processes: int = SHARD_PROCESSES,
+        shard_count: int = SHARD_COUNT,
+        lease: float = LEASE_SECONDS,
+        on_elected: Optional[Callable[[], Any]] = None,
+        on_deposed: Optional[Callable[[], Awaitable]] = None,
+    ):
+        self.bot = bot
+        self._get_client = get_client
+        self.processes = processes
+        self.shard_count = shard_count
+        self._lease_ms = int(lease * 1000)
+        self._interval = lease / 3
+        self._on_elected = on_elected
+        self._on_deposed = on_deposed
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.slot: Optional[int] = None
+        self.shard_ids: List[int] = []
+        self.is_leader = False
+
+    async def _agreed_shard_count(self, client) -> int:
+        agreed = await client.get(f"{KEY_PREFIX}:count")
+        if agreed:
+            return int(agreed)
+        desired = self.shard_count
+        if not desired:
+            # Needs the bot logged in; Discord recommends about one shard per 1000 guilds
+            desired, _ = await self.bot.http.get_bot_gateway()
+        # Every process must split the same count; the first to start fixes it
+        await client.set(f"{KEY_PREFIX}:count", desired, nx=True, px=self._lease_ms)
+        return int(await client.get(f"{KEY_PREFIX}:count"))
+
+    async def claim_shards(self) -> Tuple[List[int], int]:
+        """Wait until a slot is free and claim it; returns (shard IDs, shard count)."""
+        client = await self._get_client()
+        while True:
+            shard_count = await self._agreed_shard_count(client)
+            slots = min(self.processes, shard_count)
+            for slot in range(slots):
+                if await client.set(f"{KEY_PREFIX}:slot:{slot}", self.token, nx=True, px=self._lease_ms):
+                    self.slot = slot
+                    self.shard_ids = shards_for_slot(slot, slots, shard_count)
+                    logger.info(f"Claimed shard slot {slot}/{slots}: shards {self.shard_ids} of {shard_count}")
+                    return self.shard_ids, shard_count
+            logger.info(f"All {slots} shard slots are taken; waiting as standby")
+            await asyncio.sleep(self._interval)
+
+    async def _renew(self, client, key: str) -> bool:
+        """Extend a lease this process holds; False if it is held by someone else."""
+        return await renew_lease(client, key, self.token, self._lease_ms)
+
+    async def _release(self, client, key: str) -> None:
+        await release_lease(client, key, self.token)
+
+    async def wait_identify(self) -> None:
+        """Block until this process may IDENTIFY a shard."""
+        client = await self._get_client()
+        while not await client.set(
+            f"{KEY_PREFIX}:identify", self.token, nx=True, px=int(IDENTIFY_INTERVAL * 1000)
+        ):
+            await asyncio.sleep(0.5)
+
+    def local_stats(self) -> Dict[int, Dict[str, Any]]:
+        """Latency, guild and member counts for each shard of this process."""
+        guilds: Dict[int, int] = defaultdict(int)
+        members: Dict[int, int] = defaultdict(int)
+        for guild in self.bot.guilds:
+            guilds[guild.shard_id] += 1
+            members[guild.shard_id] += guild.member_count or 0
+        stats = {}
+        for shard_id in self.shard_ids:
+            shard = self.bot.get_shard(shard_id)
+            latency = shard.latency if shard is not None else float("nan")
+            stats[shard_id] = {
+                # NaN/inf until the shard's first heartbeat is acknowledged
+                "latency_ms": round(latency * 1000) if math.isfinite(latency) else None,
+                "guilds": guilds[shard_id],
+                "members": members[shard_id],
+                "slot": self.slot,
+                "ts": time.time(),
+            }
+        return stats
+
+    async def _publish_stats(self, client) -> None:
+        stats = self.local_stats()
+        if stats:
+            await client.hset(
+                f"{KEY_PREFIX}:stats",
+                mapping={str(shard_id): orjson.dumps(entry) for shard_id, entry in stats.items()},
+            )
+            await client.pexpire(f"{KEY_PREFIX}:stats", self._lease_ms)
+
+    async def cluster_stats(self) -> Dict[str, Any]:
+        """Totals across every process's live shards, as published to Redis."""
+        client = await self._get_client()
+        entries = await client.hgetall(f"{KEY_PREFIX}:stats")
+        count = await client.get(f"{KEY_PREFIX}:count")
+        cutoff = time.time() - self._lease_ms / 1000
+        shards = [orjson.loads(value) for value in entries.values()]
+        shards = [shard for shard in shards if shard["ts"] >= cutoff]
+        latencies = [shard["latency_ms"] for shard in shards if shard["latency_ms"] is not None]
+        return {
+            "shards_online": len(shards),
+            "shard_count": int(count) if count else len(shards),
+            "processes": len({shard["slot"] for shard in shards}),
+            "guilds": sum(shard["guilds"] for shard in shards),
+            "members": sum(shard["members"] for shard in shards),
+            "latency_avg_ms": round(sum(latencies) / len(latencies)) if latencies else None,
+            "latency_max_ms": max(latencies) if latencies else None,
+        }
+
+    async def _set_leader(self, leader: bool) -> None:
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        if leader:
+            logger.info(f"Shard slot {self.slot} is now the leader")
+            if self._on_elected is not None:
+                self._on_elected()
+        else:
+            logger.info(f"Shard slot {self.slot} is no longer the leader")
+            if self._on_deposed is not None:
+                await self._on_deposed()
+
+    async def heartbeat(self) -> None:
+        """Renew leases, contend for leadership and publish stats once."""
+        client = await self._get_client()
+        if not await self._renew(client, f"{KEY_PREFIX}:slot:{self.slot}"):
+            # Another process took the slot (e.g. this one stalled past its lease): the
+            # same shards must not be connected twice, so stop and let a supervisor restart
+            logger.error(f"Lost shard slot {self.slot}; shutting down")
+            await self._set_leader(False)
+            await self.bot.close()
+            return
+        await client.pexpire(f"{KEY_PREFIX}:count", self._lease_ms)
+        leader_key = f"{KEY_PREFIX}:leader"
+        leader = await self._renew(client, leader_key) or bool(
+            await client.set(leader_key, self.token, nx=True, px=self._lease_ms)
+        )
+        await self._set_leader(leader)
+        await self._publish_stats(client)
+
+    @property
+    def task_name(self) -> str:
+        return f"shards:slot:{self.slot}"
+
+    async def stop(self) -> None:
+        await super().stop()
+        await self._set_leader(False)
+        if self.slot is None:
+            return
+        try:
+            client = await self._get_client()
+            await client.hdel(f"{KEY_PREFIX}:stats", *[str(shard_id) for shard_id in self.shard_ids])
+            await self._release(client, f"{KEY_PREFIX}:leader")
+            await self._release(client, f"{KEY_PREFIX}:slot:{self.slot}")
+        except Exception as e:
+            logger.error(f"Error releasing shard slot {self.slot}: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error renewing shard slot {self.slot}: {e}")
+            await asyncio.sleep(self._interval)
+
+
+class ShardedBot(commands.AutoShardedBot):
+    """AutoShardedBot whose IDENTIFYs are paced across processes by its coordinator."""
+
+    coordinator: Optional[ShardCoordinator] = None
+
+    async def before_identify_hook(self, shard_id: Optional[int], *, initial: bool = False) -> None:
+        if self.coordinator is None:
+            await super().before_identify_hook(shard_id, initial=initial)
+            return
+        await self.coordinator.wait_identify()
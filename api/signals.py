@@ -0,0 +1,62 @@
+"""
+Decoding of Redis stream entries into the signal shape served by the API.
+
+Each entry is decoded and serialized once, when it is read from Redis, into a
+Signal carrying its final wire bytes. REST responses and every SSE client
+reuse those bytes, so broadcasting a signal does no per-client JSON work.
+"""
+from typing import Any, Dict
+
+import orjson
+
+from symbols import normalize_symbol
+
+
+def decode_signal(entry_id: str, fields: Dict[str, str]) -> Dict[str, Any]:
+    """Convert one stream entry into the public signal dict."""
+    return {
+        "id": entry_id,
+        "symbol": fields.get("symbol", ""),
+        "side": fields.get("side", ""),
+        "price": fields.get("price", ""),
+        "timestamp": entry_id.split("-")[0]  # Extract timestamp from stream ID
+    }
+
+
+class Signal:
+    """A stream entry with its decoded dict and pre-encoded JSON and SSE frame."""
+
+    __slots__ = ("id", "fields", "symbol", "side", "data", "json", "frame")
+
+    def __init__(self, entry_id: str, fields: Dict[str, str]):
+        self.id = entry_id
+        self.fields = fields
+        # Normalized once here so filtering and indexing are plain lookups
+        self.symbol = normalize_symbol(fields.get("symbol", ""))
+        self.side = fields.get("side", "").upper()
+        self.data = decode_signal(entry_id, fields)
+        self.json = orjson.dumps(self.data)
+        self.frame = b"id: %s\nevent: signal\ndata: %s\n\n" % (entry_id.encode(), self.json)
+
+    @property
+    def published_ms(self) -> int:
+        """Publish time in epoch milliseconds, from the stream ID."""
+        return int(self.id.split("-", 1)[0])
+
+    def frame_with_delivery(self, delivered_ms: int) -> bytes:
+        """SSE frame whose data also carries `delivered_at`, for clients measuring end-to-end lag."""
+        return b"id: %s\nevent: signal\ndata: %s,\"delivered_at\":%d}\n\n" % (
+            self.id.encode(), self.json[:-1], delivered_ms
+        )
+
+
+def encode_signals(signals, **extra: Any) -> bytes:
+    """Build a {"signals": [...], "count": n} JSON body from already-encoded signals.
+
+    Extra keyword arguments are appended as additional top-level keys.
+    """
+    signals = list(signals)
+    body = b'{"signals":[%s],"count":%d' % (b",".join(s.json for s in signals), len(signals))
+    for key, value in extra.items():
+        body += b',"%s":%s' % (key.encode(), orjson.dumps(value))
+    return body + b"}"
@@ -0,0 +1,65 @@
+"""
+Request coalescing and a versioned TTL cache for bot commands.
+
+When many users run the same command at once, SingleFlight lets the first
+invocation do the Redis fetch and every concurrent identical one await the
+same result. VersionedCache then serves the built result until it expires or
+the version it was built for (the stream's newest ID) changes, so bot Redis
+traffic follows the signal rate rather than the command rate.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """At most one in-flight call per key; concurrent callers share its result."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # One caller giving up (e.g. a cancelled command) must not cancel the shared fetch
+        return await asyncio.shield(task)
+
+
+_MISSING = object()
+
+
+class VersionedCache:
+    """Values kept for `ttl` seconds and only while their version is current."""
+
+    def __init__(self, ttl: float, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[Optional[str], float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Optional[str], default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        # Without a known version, expiry alone bounds staleness
+        if entry is not None and entry[1] > time.monotonic() and (version is None or entry[0] == version):
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return default
+
+    def put(self, key: Hashable, version: Optional[str], value: Any) -> None:
+        if len(self._entries) >= self.max_entries and key not in self._entries:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (version, time.monotonic() + self.ttl, value)
+
+    async def get_or_fetch(
+        self, key: Hashable, version: Optional[str], fetch: Callable[[], Awaitable[Any]], flight: SingleFlight
+    ) -> Any:
+        """Cached value for key at version, else one shared fetch whose result is cached."""
+        value = self.get(key, version, _MISSING)
+        if value is _MISSING:
+            value = await flight.do(key, fetch)
+            self.put(key, version, value)
+        return value
@@ -0,0 +1,159 @@
+"""
+Rolling per-symbol, per-side signal statistics for /signals/stats.
+
+Counts and price ranges are kept in fixed-size rings of time buckets, one ring
+per window, keyed by the entry's stream-ID timestamp. Entries are added as the
+hub reader receives them, so a request only sums a few hundred buckets and
+never scans the stream. The 24h history before the process started is read
+once, in chunks, the first time a stream's stats are requested.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from signals import Signal
+
+logger = logging.getLogger(__name__)
+
+# Window name -> (bucket count, bucket width in seconds)
+WINDOWS: Dict[str, Tuple[int, int]] = {
+    "1m": (60, 1),
+    "1h": (60, 60),
+    "24h": (288, 300),
+}
+BACKFILL_SECONDS = max(slots * width for slots, width in WINDOWS.values())
+BACKFILL_CHUNK = 1000
+
+
+class BucketRing:
+    """Count and price range per time bucket, in a ring of `slots` buckets."""
+
+    __slots__ = ("slots", "width", "epochs", "counts", "lows", "highs")
+
+    def __init__(self, slots: int, width: int):
+        self.slots = slots
+        self.width = width
+        # Bucket number each slot currently holds; a stale slot is reset on reuse
+        self.epochs = [-1] * slots
+        self.counts = [0] * slots
+        self.lows = [float("inf")] * slots
+        self.highs = [float("-inf")] * slots
+
+    def add(self, ts: float, price: Optional[float]) -> None:
+        epoch = int(ts // self.width)
+        i = epoch % self.slots
+        if self.epochs[i] != epoch:
+            if self.epochs[i] > epoch:
+                return  # older than the window this slot covers now
+            self.epochs[i] = epoch
+            self.counts[i] = 0
+            self.lows[i] = float("inf")
+            self.highs[i] = float("-inf")
+        self.counts[i] += 1
+        if price is not None:
+            if price < self.lows[i]:
+                self.lows[i] = price
+            if price > self.highs[i]:
+                self.highs[i] = price
+
+    def totals(self, now: float) -> Tuple[int, float, float]:
+        """Count, lowest and highest price over the buckets still inside the window."""
+        oldest = int(now // self.width) - self.slots + 1
+        count, low, high = 0, float("inf"), float("-inf")
+        for i in range(self.slots):
+            if self.epochs[i] >= oldest:
+                count += self.counts[i]
+                low = min(low, self.lows[i])
+                high = max(high, self.highs[i])
+        return count, low, high
+
+
+def _price(signal: Signal) -> Optional[float]:
+    try:
+        return float(signal.fields.get("price", ""))
+    except ValueError:
+        return None
+
+
+class SignalStats:
+    """Rolling counts per (canonical symbol, side) and window for one stream."""
+
+    def __init__(self, stream_key: str, get_client: Callable[[], Awaitable]):
+        self.stream_key = stream_key
+        self._get_client = get_client
+        self._rings: Dict[Tuple[str, str], Dict[str, BucketRing]] = {}
+        self._backfill_lock = asyncio.Lock()
+        self._backfilled = False
+        # First entry seen live; the backfill stops just before it so nothing is counted twice
+        self._live_from: Optional[str] = None
+
+    def _add(self, signal: Signal) -> None:
+        key = (signal.symbol, signal.side)
+        rings = self._rings.get(key)
+        if rings is None:
+            rings = self._rings[key] = {name: BucketRing(*shape) for name, shape in WINDOWS.items()}
+        ts = int(signal.id.split("-")[0]) / 1000
+        price = _price(signal)
+        for ring in rings.values():
+            ring.add(ts, price)
+
+    def update(self, signals: List[Signal], reset: bool = False) -> None:
+        """Hub listener. The priming snapshot is skipped; the backfill covers it."""
+        if reset:
+            return
+        if signals and self._live_from is None:
+            self._live_from = signals[0].id
+        for signal in signals:
+            self._add(signal)
+
+    async def ensure_backfilled(self, read_through: str) -> None:
+        """Count the last 24h up to `read_through` (the hub's position) once per stream."""
+        async with self._backfill_lock:
+            if self._backfilled:
+                return
+            end = f"({self._live_from}" if self._live_from else read_through
+            start = str(int((time.time() - BACKFILL_SECONDS) * 1000))
+            client = await self._get_client()
+            while True:
+                entries = await client.xrange(self.stream_key, min=start, max=end, count=BACKFILL_CHUNK)
+                for entry_id, fields in entries:
+                    self._add(Signal(entry_id, fields))
+                if len(entries) < BACKFILL_CHUNK:
+                    break
+                start = f"({entries[-1][0]}"
+            self._backfilled = True
+
+    def snapshot(self, symbols=(), now: Optional[float] = None) -> Dict[str, Any]:
+        """Per-window totals by symbol and side, with buy/sell ratio and price range."""
+        now = time.time() if now is None else now
+        symbols = set(symbols)
+        windows: Dict[str, Any] = {}
+        for name in WINDOWS:
+            by_symbol: Dict[str, Dict[str, Any]] = {}
+            total = 0
+            for (symbol, side), rings in self._rings.items():
+                if symbols and symbol not in symbols:
+                    continue
+                count, low, high = rings[name].totals(now)
+                if not count:
+                    continue
+                total += count
+                entry = by_symbol.setdefault(symbol, {"count": 0, "sides": {}})
+                entry["count"] += count
+                entry["sides"][side or "UNKNOWN"] = {
+                    "count": count,
+                    "price_min": low if low != float("inf") else None,
+                    "price_max": high if high != float("-inf") else None,
+                }
+            for entry in by_symbol.values():
+                sides = entry["sides"]
+                buys = sides.get("BUY", {}).get("count", 0)
+                sells = sides.get("SELL", {}).get("count", 0)
+                entry["buy_sell_ratio"] = round(buys / sells, 4) if sells else None
+                lows = [s["price_min"] for s in sides.values() if s["price_min"] is not None]
+                highs = [s["price_max"] for s in sides.values() if s["price_max"] is not None]
+                entry["price_min"] = min(lows) if lows else None
+                entry["price_max"] = max(highs) if highs else None
+            windows[name] = {"count": total, "symbols": by_symbol}
+        return windows
@@ -0,0 +1,92 @@
+"""
+Signal stream registry and `signals:active` alias resolution.
+
+The API serves any of the signal streams listed in requirements/streams.md.
+`signals:active` is a Redis string key naming the stream currently in use
+(e.g. `signals:paper`). It is resolved in the background on a fixed interval,
+so requests only ever do a dict lookup.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, FrozenSet, Optional
+
+from background import BackgroundService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM = os.getenv("REDIS_STREAM_KEY", "signals:live")
+
+SIGNAL_STREAMS: FrozenSet[str] = frozenset(
+    key.strip()
+    for key in os.getenv(
+        "SIGNAL_STREAMS",
+        "signals:paper,signals:staging,signals:live,"
+        "signals:scalp,signals:trend,signals:sideways,signals:momentum,signals:breakout,"
+        "stream:signals:mean_reversion",
+    ).split(",")
+    if key.strip()
+) | {DEFAULT_STREAM}
+
+ALIASES: FrozenSet[str] = frozenset({"signals:active"})
+
+ALIAS_REFRESH_SECONDS = float(os.getenv("ALIAS_REFRESH_SECONDS", "30"))
+
+# CDN caching for polled endpoints. Live signals go stale quickly; paper, staging
+# and strategy streams tolerate a few seconds at the edge.
+CACHE_CONTROL_LIVE = os.getenv(
+    "CACHE_CONTROL_LIVE", "public, max-age=0, s-maxage=1, stale-while-revalidate=2"
+)
+CACHE_CONTROL_DEFAULT = os.getenv(
+    "CACHE_CONTROL_DEFAULT", "public, max-age=0, s-maxage=5, stale-while-revalidate=30"
+)
+
+
+def cache_control(stream_key: str) -> str:
+    """Cache-Control header for responses derived from a stream."""
+    return CACHE_CONTROL_LIVE if stream_key == "signals:live" else CACHE_CONTROL_DEFAULT
+
+
+class UnknownStreamError(ValueError):
+    """Raised for a stream name that is neither a known signal stream nor an alias."""
+
+
+class AliasResolver(BackgroundService):
+    """Keeps alias key → stream name mappings fresh from Redis."""
+
+    task_name = "streams:aliases"
+
+    def __init__(self, get_client: Callable[[], Awaitable], interval: float = ALIAS_REFRESH_SECONDS):
+        self._get_client = get_client
+        self._interval = interval
+        self._targets: Dict[str, str] = {}
+
+    def resolve(self, stream: Optional[str] = None) -> str:
+        """Map a requested stream (or alias) to the concrete stream key to read."""
+        stream = stream or DEFAULT_STREAM
+        if stream in ALIASES:
+            return self._targets.get(stream, DEFAULT_STREAM)
+        if stream not in SIGNAL_STREAMS:
+            raise UnknownStreamError(f"Unknown stream {stream!r}")
+        return stream
+
+    async def refresh(self) -> None:
+        client = await self._get_client()
+        for alias in ALIASES:
+            target = await client.get(alias)
+            if target and target in SIGNAL_STREAMS:
+                if self._targets.get(alias) != target:
+                    logger.info(f"Alias {alias} now points to {target}")
+                self._targets[alias] = target
+            elif target:
+                logger.warning(f"Alias {alias} points to unknown stream {target!r}; ignoring")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refreshing stream aliases: {e}")
+            await asyncio.sleep(self._interval)
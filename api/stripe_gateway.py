@@ -0,0 +1,132 @@
+"""
+Async front for Stripe Checkout, so the bot's event loop never waits on HTTPS.
+
+The stripe library is synchronous, so calls run in a small dedicated thread
+pool. Callers beyond the pool and STRIPE_MAX_PENDING are turned away rather
+than queued without bound. Every call has a timeout, both on the HTTP client
+and on the awaiting side. Each (user, price) gets an idempotency key that is
+stable for the cache window, so Stripe retries and repeat clicks never create
+a second session; concurrent clicks share one in-flight call, and the
+resulting session URL is reused until it nears expiry. A call the caller
+stopped waiting for keeps its slot until its thread finishes, and a session
+it creates late is still cached for the next click.
+
+Environment:
+    STRIPE_SECRET_KEY               API key
+    STRIPE_API_BASE                 override the API URL, e.g. a local stub server
+    STRIPE_WORKERS                  threads making Stripe calls (default 4)
+    STRIPE_MAX_PENDING              calls running or waiting before new ones are refused (default 32)
+    STRIPE_TIMEOUT                  seconds per Stripe request (default 10)
+    STRIPE_SESSION_CACHE_SECONDS    how long a checkout URL is reused (default 1800)
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import stripe
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+STRIPE_WORKERS = int(os.getenv("STRIPE_WORKERS", "4"))
+STRIPE_MAX_PENDING = int(os.getenv("STRIPE_MAX_PENDING", "32"))
+STRIPE_TIMEOUT = float(os.getenv("STRIPE_TIMEOUT", "10"))
+SESSION_CACHE_SECONDS = float(os.getenv("STRIPE_SESSION_CACHE_SECONDS", "1800"))
+
+
+class GatewayBusyError(Exception):
+    """Raised when too many Stripe calls are already running or waiting."""
+
+
+class StripeGateway:
+    """Creates Stripe Checkout sessions off the event loop, with reuse and backpressure."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_base: Optional[str] = None,
+        workers: int = STRIPE_WORKERS,
+        max_pending: int = STRIPE_MAX_PENDING,
+        timeout: float = STRIPE_TIMEOUT,
+        session_ttl: float = SESSION_CACHE_SECONDS,
+    ):
+        self._api_key = api_key or os.getenv("STRIPE_SECRET_KEY")
+        api_base = api_base or os.getenv("STRIPE_API_BASE")
+        if api_base:
+            stripe.api_base = api_base
+        # The library's HTTP client is process-wide; this bounds each request in the worker thread
+        stripe.default_http_client = stripe.RequestsClient(timeout=timeout)
+        stripe.max_network_retries = 2
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stripe")
+        self._max_pending = max_pending
+        self._pending = 0
+        self._timeout = timeout
+        self._session_ttl = session_ttl
+        self._flight = SingleFlight()
+        self._sessions: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self.calls = 0
+        self.reused = 0
+
+    def idempotency_key(self, user_id: str, price_id: str) -> str:
+        """Same key for a (user, price) throughout one cache window."""
+        window = int(time.time() // self._session_ttl)
+        return f"checkout:{user_id}:{price_id}:{window}"
+
+    async def _call(self, fn, on_result: Optional[Callable[[Any], None]] = None, **params):
+        if self._pending >= self._max_pending:
+            raise GatewayBusyError("Too many checkout requests in progress")
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, api_key=self._api_key, **params)
+        future = loop.run_in_executor(self._executor, call)
+        self._pending += 1
+
+        def finished(future: asyncio.Future) -> None:
+            # Runs when the worker is done, however long after the caller gave up
+            self._pending -= 1
+            if on_result is not None and not future.cancelled() and future.exception() is None:
+                on_result(future.result())
+
+        future.add_done_callback(finished)
+        # Covers time queued for a worker as well as the request itself. Shielded, so a
+        # timeout leaves the future (and its slot) alive until the thread returns.
+        return await asyncio.wait_for(asyncio.shield(future), self._timeout * 2)
+
+    async def checkout_url(
+        self, user_id: str, username: str, price_id: str, success_url: str, cancel_url: str
+    ) -> str:
+        """URL of a subscription checkout for this user and price, reusing a recent one."""
+        key = (user_id, price_id)
+        cached = self._sessions.get(key)
+        if cached is not None and cached[1] > time.time():
+            self.reused += 1
+            return cached[0]
+
+        def remember(session) -> None:
+            # Never hand out a session Stripe has already expired
+            expires = min(time.time() + self._session_ttl, float(session.get("expires_at") or "inf") - 60)
+            self._sessions[key] = (session.url, expires)
+
+        async def create() -> str:
+            self.calls += 1
+            session = await self._call(
+                stripe.checkout.Session.create,
+                on_result=remember,
+                idempotency_key=self.idempotency_key(user_id, price_id),
+                payment_method_types=['card'],
+                line_items=[{'price': price_id, 'quantity': 1}],
+                mode='subscription',
+                success_url=success_url,
+                cancel_url=cancel_url,
+                metadata={'discord_user_id': user_id, 'discord_username': username},
+            )
+            return session.url
+
+        return await self._flight.do(key, create)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,111 @@
+"""
+Per-connection send queues for SSE clients.
+
+Each client gets a bounded queue that the hub pushes into without ever
+blocking. When a client stops draining, its queue fills up and the configured
+slow-consumer policy decides what happens, so one slow subscriber can't grow
+memory or hold up delivery to anyone else:
+
+- drop_oldest: discard the oldest queued signal to make room
+- coalesce: keep only the newest queued signal per symbol, then drop oldest
+- disconnect: close the connection; the client resumes via Last-Event-ID
+"""
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from filters import SignalFilter
+from signals import Signal
+
+POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "256"))
+SLOW_POLICY = os.getenv("SSE_SLOW_POLICY", "drop_oldest")
+
+_ids = itertools.count(1)
+
+
+class SlowConsumerError(Exception):
+    """Raised to a subscriber that was disconnected for falling too far behind."""
+
+
+class Subscriber:
+    """Bounded, non-blocking send queue for one SSE connection."""
+
+    def __init__(
+        self,
+        max_queue: int = QUEUE_SIZE,
+        policy: str = SLOW_POLICY,
+        signal_filter: Optional[SignalFilter] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy {policy!r}; expected one of {POLICIES}")
+        self.id = next(_ids)
+        self.policy = policy
+        self.signal_filter = signal_filter or SignalFilter()
+        self.max_queue = max_queue
+        self.connected_at = time.time()
+        self.sent = 0
+        self.dropped = 0
+        self.max_lag = 0
+        self.closed = False
+        self._queue: Deque[Signal] = deque()
+        self._ready = asyncio.Event()
+
+    @property
+    def lag(self) -> int:
+        """Signals queued for this client but not yet written."""
+        return len(self._queue)
+
+    def push(self, signal: Signal) -> bool:
+        """Queue a signal without blocking. Returns False once the subscriber is closed."""
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_queue:
+            if self.policy == "disconnect":
+                self.close()
+                return False
+            self._make_room(signal)
+        self._queue.append(signal)
+        self.max_lag = max(self.max_lag, len(self._queue))
+        self._ready.set()
+        return True
+
+    def _make_room(self, signal: Signal) -> None:
+        if self.policy == "coalesce":
+            for i, queued in enumerate(self._queue):
+                if queued.symbol == signal.symbol:
+                    del self._queue[i]
+                    self.dropped += 1
+                    return
+        self._queue.popleft()
+        self.dropped += 1
+
+    async def get(self) -> Signal:
+        while not self._queue:
+            if self.closed:
+                raise SlowConsumerError(f"subscriber {self.id} fell behind by more than {self.max_queue} signals")
+            self._ready.clear()
+            await self._ready.wait()
+        self.sent += 1
+        return self._queue.popleft()
+
+    def close(self) -> None:
+        self.closed = True
+        self._queue.clear()
+        self._ready.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "policy": self.policy,
+            "symbols": sorted(self.signal_filter.symbols),
+            "connected_at": self.connected_at,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
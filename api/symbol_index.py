@@ -0,0 +1,92 @@
+"""
+Latest signal per symbol, for "the current signal on each pair".
+
+The index is a hub listener, so it is updated from the entries the shared
+reader already decodes, and lookups never touch Redis. It is mirrored into a
+Redis hash (`<stream>:latest`, symbol → entry) so a cold-started API instance
+still knows pairs that have been quiet for longer than the hub's ring buffer.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import orjson
+
+from hub import parse_stream_id
+from signals import Signal
+
+logger = logging.getLogger(__name__)
+
+
+class SymbolIndex:
+    """Canonical symbol → newest Signal for one stream."""
+
+    def __init__(self, stream_key: str, get_client: Callable[[], Awaitable]):
+        self.stream_key = stream_key
+        self.hash_key = f"{stream_key}:latest"
+        self._get_client = get_client
+        self._latest: Dict[str, Signal] = {}
+        self._dirty: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._load_lock = asyncio.Lock()
+        self._loaded = False
+
+    def _offer(self, signal: Signal) -> bool:
+        """Keep the signal if it is newer than the one held for its symbol."""
+        if not signal.symbol:
+            return False
+        current = self._latest.get(signal.symbol)
+        if current is not None and parse_stream_id(current.id) >= parse_stream_id(signal.id):
+            return False
+        self._latest[signal.symbol] = signal
+        return True
+
+    def update(self, signals: List[Signal], reset: bool = False) -> None:
+        """Hub listener. A reset batch is a snapshot, so symbols missing from it are kept."""
+        for signal in signals:
+            if self._offer(signal):
+                self._dirty.add(signal.symbol)
+        if self._dirty and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        """Write changed symbols to the Redis hash until none are left; bursts collapse into one HSET."""
+        await asyncio.sleep(0)
+        while self._dirty:
+            # Symbols marked while an HSET is in flight are picked up by the next round
+            dirty, self._dirty = self._dirty, set()
+            mapping = {
+                symbol: orjson.dumps({"id": self._latest[symbol].id, "fields": self._latest[symbol].fields})
+                for symbol in dirty
+            }
+            try:
+                client = await self._get_client()
+                await client.hset(self.hash_key, mapping=mapping)
+            except Exception as e:
+                logger.error(f"Error persisting latest signals for {self.stream_key}: {e}")
+                self._dirty |= dirty
+                await asyncio.sleep(1)
+
+    async def ensure_loaded(self) -> None:
+        """Merge the persisted hash into memory once, for pairs older than the ring buffer."""
+        async with self._load_lock:
+            if self._loaded:
+                return
+            client = await self._get_client()
+            stored = await client.hgetall(self.hash_key)
+            for raw in stored.values():
+                try:
+                    entry = orjson.loads(raw)
+                    self._offer(Signal(entry["id"], entry["fields"]))
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"Skipping malformed entry in {self.hash_key}: {e}")
+            self._loaded = True
+
+    def get(self, symbols: Iterable[str] = ()) -> List[Signal]:
+        """Newest signal for each requested canonical symbol (all symbols if none), by symbol."""
+        symbols = set(symbols)
+        if symbols:
+            found = [self._latest[s] for s in symbols if s in self._latest]
+        else:
+            found = list(self._latest.values())
+        return sorted(found, key=lambda signal: signal.symbol)
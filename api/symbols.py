@@ -0,0 +1,55 @@
+"""
+Symbol normalization for signal filtering.
+
+Publishers spell the same pair several ways (`BTC/USD`, `BTC-USD`, `BTCUSDT`,
+Kraken's `XBTUSD`; see requirements/symbols.md). Every spelling is folded into
+the internal `BASE/QUOTE` form through a lookup table precomputed at import,
+so normalizing a symbol on the hot path is one dict lookup.
+"""
+from typing import Dict
+
+# Kraken uses XBT for Bitcoin
+BASE_ALIASES = {"XBT": "BTC"}
+BASES = ("BTC", "XBT", "ETH", "SOL", "ADA", "AVAX", "LINK", "MATIC", "DOT", "XRP", "DOGE", "LTC")
+# Stablecoin quotes are treated as USD, so BTCUSDT and BTC/USD are the same pair
+QUOTE_ALIASES = {"USDT": "USD", "USDC": "USD"}
+QUOTES = ("USD", "USDT", "USDC", "EUR")
+
+_DELIMITERS = str.maketrans("", "", "/-_: ")
+
+
+def _key(symbol: str) -> str:
+    return symbol.upper().translate(_DELIMITERS)
+
+
+def _build_lookup() -> Dict[str, str]:
+    lookup = {}
+    for base in BASES:
+        for quote in QUOTES:
+            canonical = f"{BASE_ALIASES.get(base, base)}/{QUOTE_ALIASES.get(quote, quote)}"
+            lookup[base + quote] = canonical
+    return lookup
+
+
+SYMBOL_LOOKUP: Dict[str, str] = _build_lookup()
+
+# Longest first, so USDT is split off before USD
+_QUOTES_BY_LENGTH = sorted(QUOTES, key=len, reverse=True)
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Return the canonical `BASE/QUOTE` form of a symbol, or its delimiter-free key if unknown.
+
+    Unknown pairs are split on a known quote suffix (FOOUSDT -> FOO/USD), so the
+    result depends only on the input and never on which spelling arrived first.
+    Nothing is memoized: symbols also come from client query parameters.
+    """
+    key = _key(symbol)
+    canonical = SYMBOL_LOOKUP.get(key)
+    if canonical is not None:
+        return canonical
+    for quote in _QUOTES_BY_LENGTH:
+        base = key[:-len(quote)]
+        if base and key.endswith(quote):
+            return f"{BASE_ALIASES.get(base, base)}/{QUOTE_ALIASES.get(quote, quote)}"
+    return key
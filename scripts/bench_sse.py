@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for /sse/signals
+
+Starts the API (unless --url points at one already running) against a local
+Redis, opens many concurrent SSE clients, publishes signals at a fixed rate
+and reports delivered throughput, publish→client latency percentiles, server
+memory per connection and server CPU per broadcast. Results are written as
+JSON so runs can be diffed between releases.
+
+    python scripts/bench_sse.py --clients 2000 --rate 50 --duration 30 --output bench_sse.json
+
+Needs the packages in scripts/requirements.txt (httpx for the clients).
+
+Memory and CPU figures need the server's PID, so they are only reported for a
+server this script starts. A server the script starts serves signals:bench,
+which is cleared before the run; with --url the default stream is
+REDIS_STREAM_KEY (the running server must list --stream in SIGNAL_STREAMS),
+and it is published to but never cleared. Raise the open-file limit (ulimit -n) for large
+client counts; the clients run in this one process, so watch its CPU too.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+# Add the api directory to the Python path
+api_dir = Path(__file__).parent.parent / "api"
+sys.path.insert(0, str(api_dir))
+
+from redis_pool import create_client
+
+SYMBOLS = ["BTC/USD", "ETH/USD", "SOL/USD", "MATIC/USD", "LINK/USD"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent /sse/signals subscribers")
+    parser.add_argument("--clients", type=int, default=1000, help="concurrent SSE connections")
+    parser.add_argument("--rate", type=float, default=20, help="signals published per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to publish for")
+    parser.add_argument("--connect-batch", type=int, default=200, help="connections opened at a time")
+    parser.add_argument(
+        "--stream",
+        help="stream to publish to and subscribe on (default signals:bench, or REDIS_STREAM_KEY with --url)",
+    )
+    parser.add_argument("--url", help="benchmark a running API instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="port for the API this script starts")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://127.0.0.1:6379"))
+    parser.add_argument("--output", default="bench_sse.json", help="JSON results file")
+    args = parser.parse_args()
+    if args.stream is None:
+        # A running server only accepts the streams it was configured with
+        args.stream = os.getenv("REDIS_STREAM_KEY", "signals:live") if args.url else "signals:bench"
+    return args
+
+def percentiles(samples, points=(50, 90, 99, 99.9)) -> Dict[str, Optional[float]]:
+    """Nearest-rank percentiles of latency samples in milliseconds"""
+    if not samples:
+        return {f"p{p:g}": None for p in points} | {"max": None}
+    ordered = sorted(samples)
+    result = {f"p{p:g}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2) for p in points}
+    result["max"] = round(ordered[-1], 2)
+    return result
+
+def read_proc(pid: int) -> Dict[str, float]:
+    """Resident memory (bytes) and CPU seconds of a process, from /proc"""
+    with open(f"/proc/{pid}/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return {"rss": rss_kb * 1024, "cpu": (int(fields[11]) + int(fields[12])) / ticks}
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=api_dir, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def start_server(args) -> subprocess.Popen:
+    """Run the API under uvicorn with the benchmark stream as its default stream"""
+    env = dict(os.environ, REDIS_URL=args.redis_url, REDIS_STREAM_KEY=args.stream)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=api_dir,
+        env=env,
+    )
+
+async def wait_healthy(http: httpx.AsyncClient, timeout: float = 20) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await http.get("/healthz")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("API did not become healthy")
+        await asyncio.sleep(0.2)
+
+class Subscriber:
+    """One SSE connection recording publish→receive latency for every signal frame"""
+
+    def __init__(self, http: httpx.AsyncClient, stream: str):
+        self.http = http
+        self.stream = stream
+        self.connected = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.failed: Optional[str] = None
+        self.frames = 0
+        self.latencies = array("d")
+
+    async def run(self) -> None:
+        try:
+            async with self.http.stream("GET", "/sse/signals", params={"stream": self.stream}) as response:
+                response.raise_for_status()
+                self.connected.set()
+                async for line in response.aiter_lines():
+                    if line.startswith("id: "):
+                        # The stream ID carries the publish time in milliseconds
+                        published_ms = int(line[4:].split("-", 1)[0])
+                        self.latencies.append(time.time() * 1000 - published_ms)
+                        self.frames += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed = repr(e)
+        finally:
+            self.connected.set()
+
+async def connect_all(args, http: httpx.AsyncClient) -> List[Subscriber]:
+    subscribers: List[Subscriber] = []
+    for start in range(0, args.clients, args.connect_batch):
+        batch = [Subscriber(http, args.stream) for _ in range(min(args.connect_batch, args.clients - start))]
+        for subscriber in batch:
+            subscriber.task = asyncio.create_task(subscriber.run())
+        await asyncio.gather(*(subscriber.connected.wait() for subscriber in batch))
+        subscribers.extend(batch)
+        print(f"Connected {len(subscribers)}/{args.clients} clients")
+    return subscribers
+
+async def publish(args, client) -> int:
+    """Publish at the target rate for the configured duration; returns the number published"""
+    interval = 1 / args.rate
+    published = 0
+    start = time.monotonic()
+    while time.monotonic() - start < args.duration:
+        await client.xadd(args.stream, {
+            "symbol": SYMBOLS[published % len(SYMBOLS)],
+            "side": "BUY" if published % 2 == 0 else "SELL",
+            "price": f"{50000 + published % 1000:.2f}",
+            "strategy": "bench",
+        }, maxlen=10000, approximate=True)
+        published += 1
+        # Schedule against the start time so slow iterations don't lower the rate
+        await asyncio.sleep(max(0.0, start + published * interval - time.monotonic()))
+    return published
+
+async def run_benchmark(args) -> Dict:
+    server = None if args.url else start_server(args)
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    redis_client = create_client(redis_url=args.redis_url, max_connections=2)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as http:
+            await wait_healthy(http)
+            if server is not None:
+                # Only the dedicated stream of a server started here is safe to clear
+                await redis_client.delete(args.stream)
+            idle = read_proc(server.pid) if server else None
+
+            subscribers = await connect_all(args, http)
+            connected = [s for s in subscribers if s.failed is None]
+            loaded = read_proc(server.pid) if server else None
+
+            print(f"Publishing {args.rate:g}/s for {args.duration:g}s to {len(connected)} clients")
+            started = time.monotonic()
+            published = await publish(args, redis_client)
+            # Let queued frames drain before measuring
+            await asyncio.sleep(2)
+            elapsed = time.monotonic() - started
+            finished = read_proc(server.pid) if server else None
+
+            for subscriber in subscribers:
+                subscriber.task.cancel()
+            await asyncio.gather(*(s.task for s in subscribers), return_exceptions=True)
+    finally:
+        await redis_client.aclose()
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies = array("d")
+    for subscriber in connected:
+        latencies.extend(subscriber.latencies)
+    frames = sum(s.frames for s in connected)
+    expected = published * len(connected)
+
+    results = {
+        "clients_requested": args.clients,
+        "clients_connected": len(connected),
+        "connect_failures": len(subscribers) - len(connected),
+        "signals_published": published,
+        "publish_rate": round(published / args.duration, 2),
+        "frames_received": frames,
+        "frames_expected": expected,
+        "delivery_ratio": round(frames / expected, 4) if expected else None,
+        "throughput_frames_per_s": round(frames / elapsed, 1),
+        "latency_ms": percentiles(latencies),
+    }
+    if server is not None:
+        results["server_rss_idle_bytes"] = idle["rss"]
+        results["server_rss_loaded_bytes"] = loaded["rss"]
+        results["memory_per_connection_bytes"] = (
+            round((loaded["rss"] - idle["rss"]) / len(connected)) if connected else None
+        )
+        cpu = finished["cpu"] - loaded["cpu"]
+        results["server_cpu_seconds"] = round(cpu, 3)
+        results["cpu_ms_per_broadcast"] = round(cpu * 1000 / published, 3) if published else None
+
+    return {
+        "benchmark": "sse_signals",
+        "timestamp": int(time.time()),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "clients": args.clients,
+            "rate": args.rate,
+            "duration": args.duration,
+            "stream": args.stream,
+            "url": base_url,
+            "external_server": bool(args.url),
+        },
+        "results": results,
+    }
+
+def main():
+    args = parse_args()
+    report = asyncio.run(run_benchmark(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
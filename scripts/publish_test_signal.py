@@ -1,35 +1,63 @@
 #!/usr/bin/env python3
+"""
+Publish test signals to a Redis stream
+
+With no options a single BTCUSDT signal is published to REDIS_STREAM_KEY
+(default signals:live). As a load source, --stream must be given so synthetic
+signals never land in a production stream by default (the API serves it once
+it is listed in SIGNAL_STREAMS):
+
+    # 500 signals/s for 60s over the default symbols, both sides
+    python scripts/publish_test_signal.py --stream signals:loadtest --rate 500 --duration 60
+
+    # Replay a capture (e.g. /signals/history?format=ndjson) at its original
+    # pace, 10x faster, or as fast as possible
+    python scripts/publish_test_signal.py --stream signals:loadtest --replay capture.ndjson
+    python scripts/publish_test_signal.py --stream signals:loadtest --replay capture.ndjson --speed 10
+    python scripts/publish_test_signal.py --stream signals:loadtest --replay capture.ndjson --speed 0
+
+Entries are sent in pipelined XADD batches, with approximate MAXLEN trimming
+when --maxlen is set, and the achieved rate is reported against the target
+every second.
+"""
+import argparse
 import asyncio
 import os
-import redis.asyncio as redis
+import sys
 import json
 import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Add the api directory to the Python path
+api_dir = Path(__file__).parent.parent / "api"
+sys.path.insert(0, str(api_dir))
+
+from redis_pool import create_client
+
+DEFAULT_SYMBOLS = "BTC/USD,ETH/USD,SOL/USD,MATIC/USD,LINK/USD,ADA/USD,DOT/USD,AVAX/USD"
+BASE_PRICES = {"BTC": 50000.0, "ETH": 2500.0, "SOL": 150.0, "AVAX": 35.0, "LINK": 15.0, "DOT": 7.0}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Publish test signals to a Redis stream")
+    parser.add_argument("--stream", help="stream to publish to; required with --rate or --replay")
+    parser.add_argument("--rate", type=float, help="target signals per second (load mode)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to publish for in load mode")
+    parser.add_argument("--symbols", default=DEFAULT_SYMBOLS, help="comma-separated symbols to cycle through")
+    parser.add_argument("--replay", help="NDJSON capture to replay")
+    parser.add_argument("--speed", type=float, default=1, help="replay time compression; 0 sends without delays")
+    parser.add_argument("--batch-ms", type=float, default=10, help="pipeline flush interval in milliseconds")
+    parser.add_argument("--maxlen", type=int, default=0, help="approximate MAXLEN trim; 0 (default) disables trimming")
+    args = parser.parse_args()
+    if args.stream is None:
+        if args.rate is not None or args.replay is not None:
+            parser.error("--stream is required with --rate or --replay")
+        args.stream = os.getenv("REDIS_STREAM_KEY", "signals:live")
+    return args
+
+async def publish_test_signal(stream_key: str):
+    client = create_client(max_connections=1)
 
-async def publish_test_signal():
-    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-    ssl = os.getenv("REDIS_SSL", "false").lower() == "true"
-    ca_cert_use_certifi = os.getenv("REDIS_CA_CERT_USE_CERTIFI", "false").lower() == "true"
-    stream_key = os.getenv("REDIS_STREAM_KEY", "signals:live")
-    
-    connection_kwargs = {
-        "decode_responses": True,
-    }
-    
-    if ssl:
-        from urllib.parse import urlparse
-        import certifi
-        parsed = urlparse(redis_url)
-        client = redis.Redis(
-            host=parsed.hostname,
-            port=parsed.port,
-            password=parsed.password,
-            decode_responses=True,
-            ssl=True,
-            ssl_ca_certs=certifi.where() if ca_cert_use_certifi else None
-        )
-    else:
-        client = redis.from_url(redis_url, **connection_kwargs)
-    
     try:
         # Generate a test signal
         signal_data = {
@@ -38,16 +66,141 @@ async def publish_test_signal():
             "price": f"{50000 + (time.time() % 1000):.2f}",
             "timestamp": str(int(time.time() * 1000))
         }
-        
+
         # Add to Redis stream
         entry_id = await client.xadd(stream_key, signal_data)
         print(f"Published test signal: {entry_id}")
         print(f"Data: {json.dumps(signal_data, indent=2)}")
-        
+
     except Exception as e:
         print(f"Error publishing signal: {e}")
     finally:
-        await client.close()
+        await client.aclose()
+
+def generated_signals(symbols: List[str]) -> Iterator[Dict[str, str]]:
+    """Endless signals cycling through symbols and alternating sides"""
+    n = 0
+    while True:
+        symbol = symbols[n % len(symbols)]
+        base = BASE_PRICES.get(symbol.split("/")[0], 1.0)
+        yield {
+            "symbol": symbol,
+            # Flip sides every full cycle so each symbol sees both
+            "side": "BUY" if (n // len(symbols)) % 2 == 0 else "SELL",
+            "price": f"{base * (1 + ((n * 7919) % 200 - 100) / 10000):.2f}",
+            "strategy": "load_test",
+        }
+        n += 1
+
+def read_capture(path: str) -> Iterator[Tuple[float, Dict[str, str]]]:
+    """(original publish time in seconds, fields) for each signal line of an NDJSON capture"""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            entry_id = str(record.pop("id", ""))
+            timestamp = record.pop("timestamp", None) or entry_id.split("-")[0]
+            if not timestamp:
+                # History exports end with a {"next_cursor": ...} or {"error": ...} line
+                if "error" in record:
+                    print(f"Capture ends with an error line: {record['error']}")
+                continue
+            fields = {key: str(value) for key, value in record.items() if value is not None}
+            yield int(timestamp) / 1000, fields
+
+class Publisher:
+    """Sends due entries in pipelined XADD batches and reports achieved vs target rate"""
+
+    def __init__(self, client, stream_key: str, maxlen: int, batch_ms: float):
+        self.client = client
+        self.stream_key = stream_key
+        self.maxlen = maxlen or None
+        self.batch_interval = batch_ms / 1000
+        self.published = 0
+        self.started = time.monotonic()
+        self._reported = self.started
+        self._reported_count = 0
+
+    async def send(self, batch: List[Dict[str, str]]) -> None:
+        if not batch:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        now_ms = str(int(time.time() * 1000))
+        for fields in batch:
+            pipe.xadd(self.stream_key, dict(fields, timestamp=now_ms), maxlen=self.maxlen, approximate=True)
+        await pipe.execute()
+        self.published += len(batch)
+
+    def report(self, target: Optional[float], final: bool = False) -> None:
+        now = time.monotonic()
+        if not final and now - self._reported < 1:
+            return
+        if final:
+            elapsed, count = now - self.started, self.published
+        else:
+            elapsed, count = now - self._reported, self.published - self._reported_count
+        achieved = count / elapsed if elapsed else 0.0
+        target_text = f" / target {target:.1f}/s ({achieved / target:.0%})" if target else ""
+        label = "Total" if final else f"{now - self.started:6.1f}s"
+        print(f"[{label}] {self.published} published, {achieved:.1f}/s{target_text}")
+        self._reported, self._reported_count = now, self.published
+
+async def run_load(args, publisher: Publisher) -> None:
+    signals = generated_signals([s.strip() for s in args.symbols.split(",") if s.strip()])
+    # Schedule against the start time so a slow batch is caught up by the next one
+    while True:
+        elapsed = time.monotonic() - publisher.started
+        if elapsed >= args.duration:
+            break
+        due = int(elapsed * args.rate) - publisher.published
+        await publisher.send([next(signals) for _ in range(max(0, due))])
+        publisher.report(args.rate)
+        await asyncio.sleep(publisher.batch_interval)
+    await publisher.send([next(signals) for _ in range(int(args.duration * args.rate) - publisher.published)])
+
+async def run_replay(args, publisher: Publisher) -> None:
+    first: Optional[float] = None
+    batch: List[Dict[str, str]] = []
+    try:
+        for original_ts, fields in read_capture(args.replay):
+            if first is None:
+                first = original_ts
+            if args.speed > 0:
+                due = publisher.started + (original_ts - first) / args.speed
+                if due - time.monotonic() > publisher.batch_interval:
+                    # Flush what is due now, then wait for the next entry's slot
+                    await publisher.send(batch)
+                    batch = []
+                    publisher.report(None)
+                    await asyncio.sleep(due - time.monotonic())
+            batch.append(fields)
+            if len(batch) >= 500:
+                await publisher.send(batch)
+                batch = []
+                publisher.report(None)
+    finally:
+        # Entries read before a malformed line or an interruption are still published
+        await publisher.send(batch)
+
+async def run(args) -> None:
+    client = create_client(max_connections=1)
+    publisher = Publisher(client, args.stream, args.maxlen, args.batch_ms)
+    try:
+        if args.replay:
+            await run_replay(args, publisher)
+        else:
+            await run_load(args, publisher)
+    except Exception as e:
+        print(f"Error publishing signals: {e}")
+    finally:
+        publisher.report(None if args.replay else args.rate, final=True)
+        await client.aclose()
 
 if __name__ == "__main__":
-    asyncio.run(publish_test_signal())
+    args = parse_args()
+    if args.rate is None and args.replay is None:
+        asyncio.run(publish_test_signal(args.stream))
+    else:
+        asyncio.run(run(args))
@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
 """
 Run the Discord bot with proper environment setup
+
+    python scripts/run_bot.py                   # one process, one gateway connection
+    python scripts/run_bot.py --processes 4     # sharded over 4 supervised processes
+
+With --processes, each child runs the bot with BOT_SHARDED=true and claims a
+shard slot in Redis (see api/shards.py); a child that exits is restarted.
 """
+import argparse
 import os
+import subprocess
 import sys
 import asyncio
+import time
 from pathlib import Path
 
 # Add the api directory to the Python path
@@ -34,6 +43,34 @@ async def main():
     except Exception as e:
         print(f"Error running bot: {e}")
 
+def run_processes(count: int):
+    """Run count sharded bot processes, restarting any that exit"""
+    env = dict(os.environ, BOT_SHARDED="true", BOT_SHARD_PROCESSES=str(count))
+    command = [sys.executable, __file__]
+    children = [subprocess.Popen(command, env=env) for _ in range(count)]
+    try:
+        while True:
+            time.sleep(1)
+            for i, child in enumerate(children):
+                if child.poll() is not None:
+                    print(f"Bot process {child.pid} exited with {child.returncode}; restarting")
+                    # Give its leases time to lapse so the restart can reclaim the slot
+                    time.sleep(5)
+                    children[i] = subprocess.Popen(command, env=env)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Run the Discord bot")
+    parser.add_argument("--processes", type=int, default=0, help="run sharded across this many processes")
+    args = parser.parse_args()
+    if args.processes:
+        run_processes(args.processes)
+    else:
+        asyncio.run(main())
 
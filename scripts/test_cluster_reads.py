@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test the hub reader in Redis Cluster mode against an in-memory stub
+
+No cluster is needed: the stub rejects any XREAD whose streams hash to
+different slots, as a cluster does, and otherwise serves XRANGE/XREAD from
+in-memory streams. The reader follows signal and metric streams that can't
+share a hash tag, and every one of them must still be delivered.
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Add the api directory to the Python path
+api_dir = Path(__file__).parent.parent / "api"
+sys.path.insert(0, str(api_dir))
+
+os.environ["REDIS_CLUSTER"] = "true"
+
+from redis.exceptions import RedisClusterException
+
+from hub import StreamFollower, StreamReader, parse_stream_id
+from redis_pool import xread_slot
+
+STREAMS = ["signals:live", "metrics:ticks", "exec:paper:confirms", "metrics:signals:e2e"]
+
+class StubCluster:
+    def __init__(self, streams):
+        self.entries = {stream: [] for stream in streams}
+        self.cross_slot = 0
+        self.seq = 0
+
+    def add(self, stream, fields):
+        self.seq += 1
+        self.entries[stream].append((f"{self.seq}-0", fields))
+
+    async def xrange(self, stream, min="-", count=None):
+        exclusive = min.startswith("(")
+        bound = (0, 0) if min == "-" else parse_stream_id(min.lstrip("("))
+        entries = [
+            (entry_id, fields) for entry_id, fields in self.entries[stream]
+            if parse_stream_id(entry_id) > bound or (not exclusive and parse_stream_id(entry_id) == bound)
+        ]
+        return entries[:count] if count else entries
+
+    async def xread(self, streams, block=None):
+        if len({xread_slot(key) for key in streams}) > 1:
+            self.cross_slot += 1
+            raise RedisClusterException("Keys in request don't hash to the same slot")
+        messages = []
+        for stream, after in streams.items():
+            entries = [e for e in self.entries[stream] if parse_stream_id(e[0]) > parse_stream_id(after)]
+            if entries:
+                messages.append((stream, entries))
+        if not messages:
+            await asyncio.sleep((block or 0) / 1000)
+        return messages
+
+async def test_cluster_reads():
+    """Check that followed streams in different hash slots are all read"""
+    if len({xread_slot(stream) for stream in STREAMS}) < 2:
+        print("[ERROR] Test streams unexpectedly share a hash slot")
+        return False
+
+    stub = StubCluster(STREAMS)
+
+    async def get_client():
+        return stub
+
+    received = {stream: [] for stream in STREAMS}
+
+    def handler(stream, entries):
+        received[stream].extend(entry_id for entry_id, _ in entries)
+
+    reader = StreamReader(get_client, block_ms=50, slot_of=xread_slot)
+    reader.follow(StreamFollower(get_client, STREAMS[:2], handler))
+    reader.follow(StreamFollower(get_client, STREAMS[2:], handler))
+    try:
+        # Loaded from history, then read live
+        for stream in STREAMS:
+            stub.add(stream, {"value": "1"})
+        await asyncio.sleep(0.3)
+        for stream in STREAMS:
+            stub.add(stream, {"value": "2"})
+        for _ in range(40):
+            if all(len(ids) == 2 for ids in received.values()):
+                break
+            await asyncio.sleep(0.05)
+
+        missing = [stream for stream, ids in received.items() if len(ids) != 2]
+        if missing:
+            print(f"[ERROR] Live entries not delivered on {missing}: {received}")
+            return False
+        if stub.cross_slot:
+            print(f"[ERROR] {stub.cross_slot} XREADs spanned hash slots")
+            return False
+        print(f"[SUCCESS] {len(STREAMS)} streams in {len({xread_slot(s) for s in STREAMS})} slots read without cross-slot XREADs")
+        return True
+    finally:
+        await reader.stop()
+
+if __name__ == "__main__":
+    ok = asyncio.run(test_cluster_reads())
+    print("\n[SUCCESS] Cluster read test passed!" if ok else "\n[FAILED] Cluster read test failed")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test /signals/history range bound validation
+
+No Redis is needed: bounds are validated and normalized before any XRANGE,
+so anything accepted here must be an ID Redis accepts, and anything else
+must be an InvalidRangeError (a 400, not a 500 from Redis).
+"""
+import sys
+from pathlib import Path
+
+# Add the api directory to the Python path
+api_dir = Path(__file__).parent.parent / "api"
+sys.path.insert(0, str(api_dir))
+
+from history import InvalidRangeError, parse_bound
+
+ACCEPTED = {
+    None: "-",
+    "": "-",
+    "-": "-",
+    "+": "+",
+    "1700000000000": "1700000000000",
+    "1700000000000-3": "1700000000000-3",
+    " 1700000000000-3 ": "1700000000000-3",
+    # Lenient forms parse_stream_id tolerates but XRANGE rejects
+    "123-": "123-0",
+    "+5-1": "5-1",
+}
+REJECTED = ["abc", "123-x", "-5", "1--2", "1-2-3"]
+
+def test_history_bounds():
+    """Check accepted bounds are normalized and malformed ones rejected"""
+    ok = True
+    for value, expected in ACCEPTED.items():
+        try:
+            result = parse_bound(value, "-")
+        except InvalidRangeError as e:
+            print(f"[ERROR] {value!r} rejected: {e}")
+            ok = False
+            continue
+        if result != expected:
+            print(f"[ERROR] {value!r} normalized to {result!r}, expected {expected!r}")
+            ok = False
+    for value in REJECTED:
+        try:
+            result = parse_bound(value, "-")
+        except InvalidRangeError:
+            continue
+        print(f"[ERROR] {value!r} accepted as {result!r}")
+        ok = False
+    if ok:
+        print(f"[SUCCESS] {len(ACCEPTED)} bounds normalized, {len(REJECTED)} rejected")
+    return ok
+
+if __name__ == "__main__":
+    ok = test_history_bounds()
+    print("\n[SUCCESS] History bound test passed!" if ok else "\n[FAILED] History bound test failed")
+    sys.exit(0 if ok else 1)
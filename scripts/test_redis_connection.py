@@ -4,9 +4,14 @@ Test Redis connection with the provided credentials
 """
 import asyncio
 import os
-import redis.asyncio as redis
-from urllib.parse import urlparse
-import certifi
+import sys
+from pathlib import Path
+
+# Add the api directory to the Python path
+api_dir = Path(__file__).parent.parent / "api"
+sys.path.insert(0, str(api_dir))
+
+from redis_pool import create_client
 
 async def test_redis_connection():
     """Test Redis connection with TLS"""
@@ -17,18 +22,8 @@ async def test_redis_connection():
     print(f"Testing Redis connection to: {redis_url}")
     
     try:
-        # Parse the URL
-        parsed = urlparse(redis_url)
-        
         # Create Redis client with TLS
-        client = redis.Redis(
-            host=parsed.hostname,
-            port=parsed.port,
-            password=parsed.password,
-            decode_responses=True,
-            ssl=True,
-            ssl_ca_certs=certifi.where()
-        )
+        client = create_client(max_connections=1, redis_url=redis_url, ssl=True, use_certifi=True)
         
         # Test connection
         print("Testing connection...")
@@ -58,7 +53,7 @@ async def test_redis_connection():
         length = await client.xlen(stream_key)
         print(f"[SUCCESS] Stream length: {length}")
         
-        await client.close()
+        await client.aclose()
         print("[SUCCESS] Redis connection test completed successfully")
         
     except Exception as e:
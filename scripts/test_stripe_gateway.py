@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test the bot's Stripe gateway against a local stub of the Checkout API
+
+No Stripe account or network is needed: a stub server on 127.0.0.1 answers
+POST /v1/checkout/sessions after a configurable delay and records the
+idempotency key of every request, and the gateway is pointed at it with
+STRIPE_API_BASE.
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add the api directory to the Python path
+api_dir = Path(__file__).parent.parent / "api"
+sys.path.insert(0, str(api_dir))
+
+from stripe_gateway import GatewayBusyError, StripeGateway
+
+class StubStripe(BaseHTTPRequestHandler):
+    delay = 0.2
+    # Per-request delays used first, in order, before falling back to delay
+    delays = []
+    requests = []
+    sessions = {}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        key = self.headers.get("Idempotency-Key")
+        StubStripe.requests.append(key)
+        time.sleep(StubStripe.delays.pop(0) if StubStripe.delays else StubStripe.delay)
+        # Like Stripe, a repeated idempotency key returns the original session
+        session_id = StubStripe.sessions.setdefault(key, f"cs_test_{len(StubStripe.sessions)}")
+        body = json.dumps({
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.example/{session_id}",
+            "expires_at": int(time.time()) + 86400,
+        }).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except BrokenPipeError:
+            # The gateway already gave up on this request (timeout test)
+            pass
+
+    def log_message(self, *args):
+        pass
+
+async def checkout(gateway, user_id, price_id="price_basic"):
+    return await gateway.checkout_url(user_id, f"user{user_id}", price_id, "http://localhost/ok", "http://localhost/cancel")
+
+async def test_stripe_gateway(api_base):
+    """Check reuse, idempotency, concurrency, backpressure and timeouts"""
+    gateway = StripeGateway(api_key="sk_test_stub", api_base=api_base, workers=4, max_pending=8, timeout=1)
+
+    try:
+        # Repeat clicks while a request is in flight share it
+        urls = await asyncio.gather(*(checkout(gateway, "1") for _ in range(10)))
+        if len(set(urls)) != 1 or len(StubStripe.requests) != 1:
+            print(f"[ERROR] 10 clicks made {len(StubStripe.requests)} Stripe calls")
+            return False
+        print("[SUCCESS] 10 concurrent clicks made 1 Stripe call")
+
+        # Later clicks reuse the cached session
+        if await checkout(gateway, "1") != urls[0] or len(StubStripe.requests) != 1:
+            print("[ERROR] Repeat click did not reuse the session")
+            return False
+        print("[SUCCESS] Repeat click reused the cached session")
+
+        # Idempotency keys are per (user, plan)
+        await checkout(gateway, "1", "price_pro")
+        await checkout(gateway, "2")
+        if len(set(StubStripe.requests)) != 3:
+            print(f"[ERROR] Expected 3 distinct idempotency keys, got {StubStripe.requests}")
+            return False
+        print("[SUCCESS] Each (user, plan) has its own idempotency key")
+
+        # The event loop keeps running while calls are in flight
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        ticker_task = asyncio.create_task(ticker())
+        start = time.monotonic()
+        await asyncio.gather(*(checkout(gateway, str(100 + i)) for i in range(8)))
+        elapsed = time.monotonic() - start
+        ticker_task.cancel()
+        print(f"[SUCCESS] 8 checkouts on 4 workers took {elapsed:.2f}s; loop ticked {ticks} times meanwhile")
+
+        # Calls beyond max_pending are refused instead of queued
+        results = await asyncio.gather(*(checkout(gateway, str(200 + i)) for i in range(12)), return_exceptions=True)
+        busy = sum(1 for r in results if isinstance(r, GatewayBusyError))
+        if busy != 4:
+            print(f"[ERROR] Expected 4 refused calls, got {busy}")
+            return False
+        print("[SUCCESS] Calls beyond max_pending were refused")
+
+        # A slow Stripe call times out instead of hanging the command
+        StubStripe.delay = 3
+        try:
+            await checkout(gateway, "300")
+            print("[ERROR] Slow call did not time out")
+            return False
+        except Exception as e:
+            print(f"[SUCCESS] Slow call failed after the timeout: {type(e).__name__}")
+
+        # A call that succeeds (on a retry) after the caller gave up keeps its slot until
+        # then, and its session is reused by the next click
+        while gateway._pending:
+            await asyncio.sleep(0.1)
+        StubStripe.delay, StubStripe.delays = 0.2, [3, 3]
+        calls = len(StubStripe.requests)
+        try:
+            await checkout(gateway, "400")
+            print("[ERROR] Retried call did not time out")
+            return False
+        except asyncio.TimeoutError:
+            pass
+        if gateway._pending != 1:
+            print(f"[ERROR] Timed-out call released its slot early ({gateway._pending} pending)")
+            return False
+        while gateway._pending:
+            await asyncio.sleep(0.1)
+        url = await checkout(gateway, "400")
+        if len(StubStripe.requests) != calls + 3 or len(set(StubStripe.requests[calls:])) != 1:
+            print(f"[ERROR] Expected 3 attempts with one key, got {StubStripe.requests[calls:]}")
+            return False
+        print(f"[SUCCESS] Late session was kept and reused: {url}")
+
+        return True
+    finally:
+        gateway.close()
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", int(os.getenv("STRIPE_STUB_PORT", "12111"))), StubStripe)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Stripe stub listening on port {server.server_port}")
+    try:
+        ok = asyncio.run(test_stripe_gateway(f"http://127.0.0.1:{server.server_port}"))
+    finally:
+        server.shutdown()
+    print("\n[SUCCESS] Stripe gateway test passed!" if ok else "\n[FAILED] Stripe gateway test failed")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()